@@ -4,6 +4,12 @@ CELERY_BROKER_URL = os.environ.get('REDIS_CONNECTION_URL')
 
 PROXY_STRING = os.environ.get('PROXY_STRING')
 
+PROXY_STRINGS = os.environ.get('PROXY_STRINGS', PROXY_STRING)
+
+PROXY_QUARANTINE_FAILURES_AMOUNT = int(os.environ.get('PROXY_QUARANTINE_FAILURES_AMOUNT', 3))
+
+PROXY_QUARANTINE_TIME = float(os.environ.get('PROXY_QUARANTINE_TIME', 60))
+
 REDIS_HOST = os.environ.get('REDIS_HOST')
 
 REDIS_PORT = os.environ.get('REDIS_PORT')
@@ -16,8 +22,88 @@ REDIS_KEYS_EXPIRE_TIME = int(os.environ.get('REDIS_KEYS_EXPIRE_TIME', 86400))
 
 SCRAPER_MAX_REQUEST_RETRIES = int(os.environ.get('SCRAPER_MAX_REQUEST_RETRIES', 20))
 
+SCRAPER_CONCURRENT_PAGE_REQUESTS = int(os.environ.get('SCRAPER_CONCURRENT_PAGE_REQUESTS', 1))
+
+SCRAPER_SHARD_PAGES_AMOUNT = int(os.environ.get('SCRAPER_SHARD_PAGES_AMOUNT', 0))
+
+SCRAPER_INCREMENTAL_MODE = bool(int(os.environ.get('SCRAPER_INCREMENTAL_MODE', 0)))
+
+SCRAPER_GEO_TILING_MODE = bool(int(os.environ.get('SCRAPER_GEO_TILING_MODE', 0)))
+
+SCRAPER_TILE_MAX_ADVERTS = int(os.environ.get('SCRAPER_TILE_MAX_ADVERTS', 1000))
+
+SCRAPER_TILE_MAX_DEPTH = int(os.environ.get('SCRAPER_TILE_MAX_DEPTH', 6))
+
+SCRAPER_TILE_MAX_MISSED_ADVERTS = int(os.environ.get('SCRAPER_TILE_MAX_MISSED_ADVERTS', 100))
+
+SCRAPER_TASK_VISIBILITY_TIMEOUT = int(os.environ.get('SCRAPER_TASK_VISIBILITY_TIMEOUT', 43200))
+
 IMAGES_DOWNLOADER_MAX_REQUEST_RETRIES = int(os.environ.get('IMAGES_DOWNLOADER_MAX_REQUEST_RETRIES', 10,))
 
+IMAGES_DOWNLOADER_CONNECTIONS_LIMIT = int(os.environ.get('IMAGES_DOWNLOADER_CONNECTIONS_LIMIT', 100))
+
+IMAGES_DOWNLOADER_CONNECTIONS_PER_HOST_LIMIT = int(os.environ.get('IMAGES_DOWNLOADER_CONNECTIONS_PER_HOST_LIMIT', 50))
+
+IMAGES_DOWNLOADER_KEEPALIVE_TIMEOUT = float(os.environ.get('IMAGES_DOWNLOADER_KEEPALIVE_TIMEOUT', 30))
+
+IMAGES_DOWNLOADER_DNS_CACHE_TTL = int(os.environ.get('IMAGES_DOWNLOADER_DNS_CACHE_TTL', 300))
+
+IMAGES_DOWNLOADER_WORKERS_AMOUNT = int(os.environ.get('IMAGES_DOWNLOADER_WORKERS_AMOUNT', 100))
+
+IMAGES_DOWNLOADER_QUEUE_SIZE = int(os.environ.get('IMAGES_DOWNLOADER_QUEUE_SIZE', 500))
+
+IMAGES_DOWNLOADER_POP_BATCH_SIZE = int(os.environ.get('IMAGES_DOWNLOADER_POP_BATCH_SIZE', 50))
+
+IMAGES_DOWNLOADER_IMAGE_EXECUTOR = os.environ.get('IMAGES_DOWNLOADER_IMAGE_EXECUTOR', 'process')
+
+IMAGES_DOWNLOADER_IMAGE_WORKERS_AMOUNT = int(os.environ.get('IMAGES_DOWNLOADER_IMAGE_WORKERS_AMOUNT', os.cpu_count() or 1))
+
+RETRY_BASE_DELAY = float(os.environ.get('RETRY_BASE_DELAY', 0.5))
+
+RETRY_MAX_DELAY = float(os.environ.get('RETRY_MAX_DELAY', 30))
+
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_BREAKER_FAILURE_THRESHOLD', 10))
+
+CIRCUIT_BREAKER_RESET_TIMEOUT = float(os.environ.get('CIRCUIT_BREAKER_RESET_TIMEOUT', 30))
+
+SCRAPER_REQUESTS_PER_SECOND = float(os.environ.get('SCRAPER_REQUESTS_PER_SECOND', 0))
+
+IMAGES_DOWNLOADER_REQUESTS_PER_SECOND = float(os.environ.get('IMAGES_DOWNLOADER_REQUESTS_PER_SECOND', 0))
+
+RATE_LIMITER_BURST = float(os.environ.get('RATE_LIMITER_BURST', 5))
+
 MINIMUM_UNIQUENESS_COEFFICIENT = float(os.environ.get('MINIMUM_UNIQUENESS_COEFFICIENT', 0.92))
 
 POST_MODERATION_FOLDER = os.environ.get('POST_MODERATION_FOLDER', 'post_moderation')
+
+IMAGE_STORE_FOLDER = os.environ.get('IMAGE_STORE_FOLDER', 'image_store')
+
+IMAGE_STORE_MAX_SIZE_MB = int(os.environ.get('IMAGE_STORE_MAX_SIZE_MB', 10240))
+
+IMAGE_SHARDS_MODE = bool(int(os.environ.get('IMAGE_SHARDS_MODE', 0)))
+
+IMAGE_SHARDS_FOLDER = os.environ.get('IMAGE_SHARDS_FOLDER', 'image_shards')
+
+IMAGE_SHARD_CAPACITY = int(os.environ.get('IMAGE_SHARD_CAPACITY', 1024))
+
+ANALYZER_BATCH_SIZE = int(os.environ.get('ANALYZER_BATCH_SIZE', 64))
+
+PERCEPTUAL_HASH_MAX_DISTANCE = int(os.environ.get('PERCEPTUAL_HASH_MAX_DISTANCE', 3))
+
+ANALYZER_SIMILARITY_MEMORY_LIMIT_MB = int(os.environ.get('ANALYZER_SIMILARITY_MEMORY_LIMIT_MB', 512))
+
+ANALYZER_SIMILARITY_TOP_K = int(os.environ.get('ANALYZER_SIMILARITY_TOP_K', 0))
+
+EMBEDDING_CACHE_FOLDER = os.environ.get('EMBEDDING_CACHE_FOLDER', 'embedding_cache')
+
+ANALYZER_EXECUTOR = os.environ.get('ANALYZER_EXECUTOR', 'process')
+
+ANALYZER_WORKERS_AMOUNT = int(os.environ.get('ANALYZER_WORKERS_AMOUNT', 2))
+
+ANALYZER_MAX_INTERRUPTED_ATTEMPTS = int(os.environ.get('ANALYZER_MAX_INTERRUPTED_ATTEMPTS', 3))
+
+ANALYZER_TORCH_THREADS = int(
+    os.environ.get('ANALYZER_TORCH_THREADS') or max(1, (os.cpu_count() or 1) // ANALYZER_WORKERS_AMOUNT)
+)
+
+STAGE_EVENTS_WAIT_TIMEOUT = float(os.environ.get('STAGE_EVENTS_WAIT_TIMEOUT', 30))
@@ -39,4 +39,35 @@ IS_FOLDER_ANALYZED_KEY = 'is_folder_analyzed'
 
 UNIQUE_ADVERTS_KEY = 'unique_adverts'
 
+SHARDS_AMOUNT_KEY = 'shards_amount'
+
+LISTING_WATERMARK_KEY = 'listing_watermark'
+
+ANALYZED_UNIQUE_IMAGES_KEY = 'analyzed_unique_images'
+
+DUPLICATE_ADVERTS_KEY = 'duplicate_adverts'
+
+NEWEST_LISTING_WATERMARK_KEY = 'newest_listing_watermark'
+
+SCRAPER_RUN_ID_KEY = 'scraper_run_id'
+
+ANALYZE_ERROR_KEY = 'analyze_error'
+
+ANALYZE_ATTEMPTS_KEY = 'analyze_attempts'
+
+STAGE_EVENTS_CHANNEL = 'stage_events'
+
+IMAGES_PUSHED_STAGE = 'images_pushed'
+
 INCREMENT_VALUE = 1
+
+
+# ANALYZER MODEL INPUT
+
+ANALYZER_MODEL_NAME = 'inception-v3-imagenet-torch'
+
+ANALYZER_MODEL_INPUT_SIZE = (299, 299)
+
+STORED_IMAGE_FORMAT = 'JPEG'
+
+STORED_IMAGE_QUALITY = 90
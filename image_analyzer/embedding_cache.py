@@ -0,0 +1,78 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import (
+    Dict,
+    Iterator,
+    List,
+)
+
+import numpy as np
+
+from config import EMBEDDING_CACHE_FOLDER
+
+
+class EmbeddingCache:
+    QUERY_CHUNK_SIZE = 500
+
+    def __init__(
+            self,
+            folder: str = EMBEDDING_CACHE_FOLDER,
+    ):
+        os.makedirs(folder, exist_ok=True)
+        self.path = os.path.join(folder, 'embeddings.sqlite3')
+
+        with self.__connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings ('
+                'model_name TEXT NOT NULL, '
+                'content_hash TEXT NOT NULL, '
+                'embedding BLOB NOT NULL, '
+                'PRIMARY KEY (model_name, content_hash))'
+            )
+
+    def get_many(
+            self,
+            model_name: str,
+            content_hashes: List[str],
+    ) -> Dict[str, np.ndarray]:
+        embeddings = dict()
+
+        with self.__connect() as connection:
+            for chunk_start in range(0, len(content_hashes), self.QUERY_CHUNK_SIZE):
+                chunk = content_hashes[chunk_start:chunk_start + self.QUERY_CHUNK_SIZE]
+                rows = connection.execute(
+                    f'SELECT content_hash, embedding FROM embeddings '
+                    f'WHERE model_name = ? AND content_hash IN ({", ".join("?" * len(chunk))})',
+                    [model_name, *chunk],
+                )
+
+                for content_hash, embedding in rows:
+                    embeddings[content_hash] = np.frombuffer(embedding, dtype=np.float32)
+
+        return embeddings
+
+    def put_many(
+            self,
+            model_name: str,
+            embeddings: Dict[str, np.ndarray],
+    ) -> None:
+        with self.__connect() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO embeddings (model_name, content_hash, embedding) VALUES (?, ?, ?)',
+                [
+                    (model_name, content_hash, np.asarray(embedding, dtype=np.float32).tobytes())
+                    for content_hash, embedding in embeddings.items()
+                ],
+            )
+
+    @contextmanager
+    def __connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=30)
+
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
@@ -1,28 +1,69 @@
+import functools
+import hashlib
+import io
+import multiprocessing
 import os
 import shutil
-import threading
-import time
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from concurrent.futures.process import BrokenProcessPool
 from logging import INFO
+from typing import (
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import cv2
 import fiftyone as fo
-import fiftyone.zoo as foz
 import matplotlib.pyplot as plt
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+import torch
+from PIL import Image
 
 from config import (
     MINIMUM_UNIQUENESS_COEFFICIENT,
     POST_MODERATION_FOLDER,
+    IMAGE_SHARDS_MODE,
+    ANALYZER_BATCH_SIZE,
+    PERCEPTUAL_HASH_MAX_DISTANCE,
+    STAGE_EVENTS_WAIT_TIMEOUT,
+    ANALYZER_SIMILARITY_MEMORY_LIMIT_MB,
+    ANALYZER_SIMILARITY_TOP_K,
+    ANALYZER_EXECUTOR,
+    ANALYZER_WORKERS_AMOUNT,
+    ANALYZER_TORCH_THREADS,
+    ANALYZER_MAX_INTERRUPTED_ATTEMPTS,
 )
 from constants import (
     RUN_SETTINGS_LIST,
     IS_IMAGES_DOWNLOADED_KEY,
     IS_FOLDER_ANALYZED_KEY,
     UNIQUE_ADVERTS_KEY,
+    ANALYZED_UNIQUE_IMAGES_KEY,
+    ANALYZER_MODEL_NAME,
+    ANALYZE_ERROR_KEY,
+    ANALYZE_ATTEMPTS_KEY,
+    INCREMENT_VALUE,
+)
+from embedding_cache import EmbeddingCache
+from model_registry import (
+    ModelRegistry,
+    SharedModel,
 )
+from similarity_search import find_similar_images
+from utils.image_shards import ImageShards
+from utils.image_store import ImageStore
 from utils.logger import LoggerFactory
+from utils.perceptual_hash import PerceptualHashIndex
 from utils.redis_client import RedisClient
+from utils.stage_events import StageEvents
 
 
 class ImageAnalyzer:
@@ -34,38 +75,66 @@ class ImageAnalyzer:
             log_file='ANALYZER.log',
         )
         self.redis_client = RedisClient()
-        self.__clean_folder()
+        self.image_store = ImageStore()
+        self.embedding_cache = EmbeddingCache()
+        self.stage_events = StageEvents(
+            redis_client=self.redis_client,
+        )
+        self.analysis_executor: Optional[Executor] = None
+        self.is_analysis_executor_broken = False
         self.logger.info('ANALYZER CREATED')
 
     def start(self) -> None:
-        while True:
-            for run_settings in RUN_SETTINGS_LIST:
-
-                if self.__check_if_already_downloaded_and_not_analyzed(
-                    filter_name=run_settings["filter_name"],
-                ):
-                    self.__notify_folder_analyze_started(
-                        filter_name=run_settings['filter_name'],
-                    )
-                    analyze_thread = threading.Thread(
-                        target=self.__analyze_folder_and_get_unique_adverts_number,
-                        name=f"Analyzer | {run_settings['filter_name']}",
-                        args=(run_settings["filter_name"], ),
-                    )
-                    analyze_thread.start()
+        self.__clean_folder()
+        self.stage_events.subscribe()
+
+        try:
+            while True:
+                if self.analysis_executor is None or self.is_analysis_executor_broken:
+                    self.__recreate_analysis_executor()
 
-            time.sleep(5)
+                for run_settings in RUN_SETTINGS_LIST:
 
-    def __analyze_folder_and_get_unique_adverts_number(
+                    if self.__check_if_already_downloaded_and_not_analyzed(
+                        filter_name=run_settings["filter_name"],
+                    ):
+                        self.__notify_folder_analyze_started(
+                            filter_name=run_settings['filter_name'],
+                        )
+                        self.__submit_analysis(
+                            folder_name=run_settings['filter_name'],
+                        )
+
+                self.stage_events.wait(
+                    timeout=STAGE_EVENTS_WAIT_TIMEOUT,
+                )
+        finally:
+            if self.analysis_executor is not None:
+                self.analysis_executor.shutdown(
+                    cancel_futures=True,
+                )
+
+    def analyze_folder_and_get_unique_adverts_number(
             self,
             folder_name: str,
     ) -> None:
+        image_ids = self.__get_image_ids(
+            filter_name=folder_name,
+        )
+        image_groups = self.__group_images_by_hashes(
+            image_ids=image_ids,
+            filter_name=folder_name,
+        )
+        representative_ids = {image_group[0] for image_group in image_groups}
+        representative_ids = [image_id for image_id in image_ids if image_id in representative_ids]
         images_dataset = self.__create_dataset_list_from_folder_files(
-            folder_name=folder_name,
+            image_ids=representative_ids,
+            filter_name=folder_name,
         )
         self.logger.info(f'CREATED THE IMAGES DATASET FROM FOLDER | {folder_name}')
         unique_adverts_count = self.__get_unique_images_number(
             images_dataset=images_dataset,
+            image_ids=representative_ids,
             filter_name=folder_name,
         )
         self.logger.info(f'UNIQUE ADVERTS FOUND: {unique_adverts_count} | {folder_name}')
@@ -78,16 +147,27 @@ class ImageAnalyzer:
     def __get_unique_images_number(
             self,
             images_dataset: fo.Dataset,
+            image_ids: List[str],
             filter_name: str,
     ) -> int:
         self.logger.info(f'STARTED TO COMPARE THE IMAGES | {filter_name}')
         samples_to_remove = set()
         samples_to_keep = set()
-        model = foz.load_zoo_model("inception-v3-imagenet-torch")
-        embeddings = images_dataset.compute_embeddings(model)
-        similarity_matrix = cosine_similarity(embeddings)
-        similarity_matrix_length = len(similarity_matrix)
-        similarity_matrix = similarity_matrix - np.identity(similarity_matrix_length)
+        model = ModelRegistry.get_model(
+            model_name=ANALYZER_MODEL_NAME,
+        )
+        embeddings = self.__compute_embeddings(
+            images_dataset=images_dataset,
+            image_ids=image_ids,
+            model=model,
+            filter_name=filter_name,
+        )
+        similar_images = find_similar_images(
+            embeddings=embeddings,
+            threshold=MINIMUM_UNIQUENESS_COEFFICIENT,
+            memory_limit_mb=ANALYZER_SIMILARITY_MEMORY_LIMIT_MB,
+            top_k=ANALYZER_SIMILARITY_TOP_K,
+        )
         id_map = [s.id for s in images_dataset.select_fields(["id"])]
         filepath_map = {s.id: s.filepath for s in images_dataset.select_fields(["id", "filepath"])}
 
@@ -99,18 +179,17 @@ class ImageAnalyzer:
 
                 samples_to_keep.add(sample.id)
 
-                dup_idxs = np.where(similarity_matrix[idx] > MINIMUM_UNIQUENESS_COEFFICIENT)[0]
+                dup_idxs = similar_images[idx]
 
                 for dup in dup_idxs:
-                    post_moderation_file_name = (
-                        f'{sample.filepath.split("/")[-1].split(".")[0]}_'
-                        f'{filepath_map[id_map[dup]].split("/")[-1].split(".")[0]}.png'
-                    )
-                    filepath = f'{POST_MODERATION_FOLDER}/{filter_name}_{post_moderation_file_name}'
                     self.__create_post_moderation_view(
                         first_image_path=sample.filepath,
                         second_image_path=filepath_map[id_map[dup]],
-                        filepath=filepath,
+                        filepath=self.__get_post_moderation_path(
+                            first_image_path=sample.filepath,
+                            second_image_path=filepath_map[id_map[dup]],
+                            filter_name=filter_name,
+                        ),
                     )
                     samples_to_remove.add(id_map[dup])
 
@@ -123,6 +202,262 @@ class ImageAnalyzer:
 
         return len(samples_to_keep)
 
+    def __recreate_analysis_executor(self) -> None:
+        if self.analysis_executor is not None:
+            self.logger.error('ANALYSIS WORKERS POOL IS BROKEN, RECREATING')
+            self.analysis_executor.shutdown(
+                wait=False,
+                cancel_futures=True,
+            )
+
+        self.is_analysis_executor_broken = False
+        self.analysis_executor = self.__create_analysis_executor()
+
+    @staticmethod
+    def __create_analysis_executor() -> Executor:
+        if ANALYZER_EXECUTOR == 'thread':
+            torch.set_num_threads(os.cpu_count() or 1)
+            return ThreadPoolExecutor(
+                max_workers=ANALYZER_WORKERS_AMOUNT,
+                thread_name_prefix='Analyzer',
+            )
+
+        return ProcessPoolExecutor(
+            max_workers=ANALYZER_WORKERS_AMOUNT,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_analysis_worker,
+            initargs=(ANALYZER_TORCH_THREADS, ),
+        )
+
+    def __submit_analysis(
+            self,
+            folder_name: str,
+    ) -> None:
+        try:
+            if ANALYZER_EXECUTOR == 'thread':
+                analysis_future = self.analysis_executor.submit(
+                    self.analyze_folder_and_get_unique_adverts_number,
+                    folder_name,
+                )
+            else:
+                analysis_future = self.analysis_executor.submit(
+                    analyze_folder_in_worker,
+                    folder_name,
+                )
+        except BrokenProcessPool:
+            self.is_analysis_executor_broken = True
+            self.logger.error(f'ANALYZE NOT SUBMITTED TO A BROKEN WORKERS POOL | {folder_name}')
+            self.__notify_folder_analyze_interrupted(
+                filter_name=folder_name,
+            )
+            return
+
+        analysis_future.add_done_callback(
+            functools.partial(
+                self.__handle_analysis_done,
+                folder_name=folder_name,
+            )
+        )
+
+    def __handle_analysis_done(
+            self,
+            analysis_future: Future,
+            folder_name: str,
+    ) -> None:
+        if analysis_future.cancelled():
+            self.__notify_folder_analyze_interrupted(
+                filter_name=folder_name,
+            )
+            return
+
+        analysis_error = analysis_future.exception()
+
+        if analysis_error is None:
+            return
+
+        if isinstance(analysis_error, BrokenProcessPool):
+            self.is_analysis_executor_broken = True
+            interrupted_attempts_amount = self.redis_client.hash_increase(
+                main_key=folder_name,
+                inner_key=ANALYZE_ATTEMPTS_KEY,
+                value=INCREMENT_VALUE,
+            )
+            self.logger.error(
+                f'ANALYZE INTERRUPTED BY A BROKEN WORKERS POOL: '
+                f'{interrupted_attempts_amount}/{ANALYZER_MAX_INTERRUPTED_ATTEMPTS} | {folder_name}'
+            )
+
+            if interrupted_attempts_amount < ANALYZER_MAX_INTERRUPTED_ATTEMPTS:
+                self.__notify_folder_analyze_interrupted(
+                    filter_name=folder_name,
+                )
+                return
+
+        self.logger.error(f'ANALYZE FAILED: {analysis_error!r} | {folder_name}')
+        self.__notify_folder_analyze_failed(
+            filter_name=folder_name,
+            analysis_error=analysis_error,
+        )
+
+    def __group_images_by_hashes(
+            self,
+            image_ids: List[str],
+            filter_name: str,
+    ) -> List[List[str]]:
+        if PERCEPTUAL_HASH_MAX_DISTANCE < 0:
+            return [[image_id] for image_id in image_ids]
+
+        image_hashes = self.redis_client.hash_get_all(
+            main_key=f'{filter_name}_image_hashes',
+        )
+        hash_index = PerceptualHashIndex(
+            max_distance=PERCEPTUAL_HASH_MAX_DISTANCE,
+        )
+        unhashed_image_groups = list()
+
+        for image_id in image_ids:
+            if image_id in image_hashes:
+                hash_index.add(
+                    image_id=image_id,
+                    image_hash=image_hashes[image_id],
+                )
+            else:
+                unhashed_image_groups.append([image_id])
+
+        image_groups = hash_index.get_groups()
+
+        for representative_id, *duplicate_ids in image_groups:
+            for duplicate_id in duplicate_ids:
+                first_image_path = self.image_store.get_path(
+                    image_id=representative_id,
+                )
+                second_image_path = self.image_store.get_path(
+                    image_id=duplicate_id,
+                )
+                self.__create_post_moderation_view(
+                    first_image_path=first_image_path,
+                    second_image_path=second_image_path,
+                    filepath=self.__get_post_moderation_path(
+                        first_image_path=first_image_path,
+                        second_image_path=second_image_path,
+                        filter_name=filter_name,
+                    ),
+                )
+
+        self.logger.info(
+            f'HASH DUPLICATES FOUND: {len(image_ids) - len(image_groups) - len(unhashed_image_groups)} | {filter_name}'
+        )
+        return image_groups + unhashed_image_groups
+
+    def __compute_embeddings(
+            self,
+            images_dataset: fo.Dataset,
+            image_ids: List[str],
+            model: SharedModel,
+            filter_name: str,
+    ) -> np.ndarray:
+        embeddings = list()
+        cache_hits_amount = 0
+
+        for content_hashes, images in self.__iterate_image_batches(
+            images_dataset=images_dataset,
+            image_ids=image_ids,
+            filter_name=filter_name,
+        ):
+            batch_embeddings = self.embedding_cache.get_many(
+                model_name=ANALYZER_MODEL_NAME,
+                content_hashes=content_hashes,
+            )
+            cache_hits_amount += len(batch_embeddings)
+            missing_indexes = [
+                index
+                for index, content_hash in enumerate(content_hashes)
+                if content_hash not in batch_embeddings
+            ]
+
+            if missing_indexes:
+                missing_embeddings = dict(
+                    zip(
+                        [content_hashes[index] for index in missing_indexes],
+                        model.embed_all([self.__decode_image(images[index]) for index in missing_indexes]),
+                    )
+                )
+                self.embedding_cache.put_many(
+                    model_name=ANALYZER_MODEL_NAME,
+                    embeddings=missing_embeddings,
+                )
+                batch_embeddings.update(missing_embeddings)
+
+            embeddings.extend(batch_embeddings[content_hash] for content_hash in content_hashes)
+
+        self.logger.info(f'EMBEDDING CACHE HITS: {cache_hits_amount}/{len(embeddings)} | {filter_name}')
+
+        if not embeddings:
+            return np.empty((0, 0), dtype=np.float32)
+
+        return np.stack(embeddings)
+
+    def __iterate_image_batches(
+            self,
+            images_dataset: fo.Dataset,
+            image_ids: List[str],
+            filter_name: str,
+    ) -> Iterator[Tuple[List[str], List[Union[bytes, np.ndarray]]]]:
+        if not IMAGE_SHARDS_MODE:
+            image_paths = images_dataset.values('filepath')
+
+            for batch_start in range(0, len(image_paths), ANALYZER_BATCH_SIZE):
+                images = list()
+
+                for image_path in image_paths[batch_start:batch_start + ANALYZER_BATCH_SIZE]:
+                    with open(image_path, 'rb') as image_file:
+                        images.append(image_file.read())
+
+                yield [hashlib.sha1(image).hexdigest() for image in images], images
+
+            return
+
+        image_shards = ImageShards(
+            redis_client=self.redis_client,
+            filter_name=filter_name,
+        )
+        selected_image_ids = set(image_ids)
+
+        for batch_image_ids, images_batch in image_shards.read_batches(
+            batch_size=ANALYZER_BATCH_SIZE,
+        ):
+            images = [
+                image
+                for image_id, image in zip(batch_image_ids, images_batch)
+                if image_id in selected_image_ids
+            ]
+
+            if images:
+                yield [hashlib.sha1(image).hexdigest() for image in images], images
+
+    @staticmethod
+    def __decode_image(
+            image: Union[bytes, np.ndarray],
+    ) -> np.ndarray:
+        if isinstance(image, bytes):
+            return np.asarray(
+                Image.open(io.BytesIO(image)).convert('RGB')
+            )
+
+        return image
+
+    @staticmethod
+    def __get_post_moderation_path(
+            first_image_path: str,
+            second_image_path: str,
+            filter_name: str,
+    ) -> str:
+        post_moderation_file_name = (
+            f'{first_image_path.split("/")[-1].split(".")[0]}_'
+            f'{second_image_path.split("/")[-1].split(".")[0]}.png'
+        )
+        return f'{POST_MODERATION_FOLDER}/{filter_name}_{post_moderation_file_name}'
+
     @staticmethod
     def __create_post_moderation_view(
             first_image_path: str,
@@ -141,14 +476,43 @@ class ImageAnalyzer:
         except BaseException:
             pass
 
-    @staticmethod
+    def __get_image_ids(
+            self,
+            filter_name: str,
+    ) -> List[str]:
+        if IMAGE_SHARDS_MODE:
+            return ImageShards(
+                redis_client=self.redis_client,
+                filter_name=filter_name,
+            ).get_image_ids()
+
+        return self.redis_client.set_members(
+            key=f'{filter_name}_stored_images',
+        )
+
     def __create_dataset_list_from_folder_files(
-            folder_name: str,
+            self,
+            image_ids: List[str],
+            filter_name: str,
     ) -> fo.Dataset:
-        return fo.Dataset.from_dir(
-            dataset_dir=folder_name,
-            dataset_type=fo.types.ImageDirectory,
-        )
+        image_paths = [
+            self.image_store.get_path(
+                image_id=image_id,
+            )
+            for image_id in image_ids
+        ]
+
+        if IMAGE_SHARDS_MODE:
+            return fo.Dataset.from_images(image_paths)
+
+        stored_image_paths = [image_path for image_path in image_paths if os.path.isfile(image_path)]
+
+        if len(stored_image_paths) < len(image_paths):
+            self.logger.error(
+                f'MISSING STORED IMAGES: {len(image_paths) - len(stored_image_paths)}/{len(image_paths)} | {filter_name}'
+            )
+
+        return fo.Dataset.from_images(stored_image_paths)
 
     def __notify_folder_analyze_started(
             self,
@@ -159,22 +523,79 @@ class ImageAnalyzer:
             inner_key=IS_FOLDER_ANALYZED_KEY,
             value='started',
         )
+        self.redis_client.hash_set(
+            main_key=filter_name,
+            inner_key=ANALYZE_ERROR_KEY,
+            value=None,
+        )
         self.logger.info(f'STARTED TO ANALYZE THE FOLDER | {filter_name}')
 
+    def __notify_folder_analyze_interrupted(
+            self,
+            filter_name: str,
+    ) -> None:
+        self.redis_client.hash_set(
+            main_key=filter_name,
+            inner_key=IS_FOLDER_ANALYZED_KEY,
+            value=False,
+        )
+        self.stage_events.publish(
+            filter_name=filter_name,
+            stage=IS_FOLDER_ANALYZED_KEY,
+        )
+
+    def __notify_folder_analyze_failed(
+            self,
+            filter_name: str,
+            analysis_error: BaseException,
+    ) -> None:
+        self.redis_client.hash_set(
+            main_key=filter_name,
+            inner_key=ANALYZE_ERROR_KEY,
+            value=repr(analysis_error),
+        )
+        self.redis_client.hash_set(
+            main_key=filter_name,
+            inner_key=IS_FOLDER_ANALYZED_KEY,
+            value='failed',
+        )
+        self.stage_events.publish(
+            filter_name=filter_name,
+            stage=IS_FOLDER_ANALYZED_KEY,
+        )
+
     def __notify_folder_analyzed(
             self,
             filter_name: str,
             unique_adverts_count: int,
     ) -> None:
+        previously_analyzed_unique_images = self.redis_client.hash_get(
+            main_key=filter_name,
+            inner_key=ANALYZED_UNIQUE_IMAGES_KEY,
+        ) or 0
         self.redis_client.hash_set(
             main_key=filter_name,
             inner_key=IS_FOLDER_ANALYZED_KEY,
             value=True,
         )
+        self.redis_client.hash_set(
+            main_key=filter_name,
+            inner_key=ANALYZE_ATTEMPTS_KEY,
+            value=0,
+        )
+        self.stage_events.publish(
+            filter_name=filter_name,
+            stage=IS_FOLDER_ANALYZED_KEY,
+        )
+        self.redis_client.hash_set(
+            main_key=filter_name,
+            inner_key=ANALYZED_UNIQUE_IMAGES_KEY,
+            value=unique_adverts_count,
+        )
         self.redis_client.hash_increase(
             main_key=filter_name,
             inner_key=UNIQUE_ADVERTS_KEY,
-            value=unique_adverts_count,
+            value=unique_adverts_count - previously_analyzed_unique_images,
         )
         self.logger.info(f'UNIQUE ADVERTS FOUND: {unique_adverts_count} | {filter_name}')
 
@@ -216,6 +637,26 @@ class ImageAnalyzer:
             pass
 
 
+_WORKER_IMAGE_ANALYZER: Optional[ImageAnalyzer] = None
+
+
+def init_analysis_worker(
+        torch_threads: int,
+) -> None:
+    global _WORKER_IMAGE_ANALYZER
+
+    torch.set_num_threads(torch_threads)
+    _WORKER_IMAGE_ANALYZER = ImageAnalyzer()
+
+
+def analyze_folder_in_worker(
+        folder_name: str,
+) -> None:
+    _WORKER_IMAGE_ANALYZER.analyze_folder_and_get_unique_adverts_number(
+        folder_name=folder_name,
+    )
+
+
 if __name__ == '__main__':
     image_analyzer = ImageAnalyzer()
     image_analyzer.start()
@@ -0,0 +1,63 @@
+import threading
+from typing import (
+    Dict,
+    List,
+)
+
+import fiftyone.core.models as fom
+import fiftyone.zoo as foz
+import numpy as np
+
+from constants import ANALYZER_MODEL_INPUT_SIZE
+
+
+class SharedModel:
+
+    def __init__(
+            self,
+            model: fom.Model,
+    ):
+        self._model = model
+        self._inference_lock = threading.Lock()
+
+    def embed_all(
+            self,
+            images: List[np.ndarray],
+    ) -> np.ndarray:
+        with self._inference_lock:
+            return self._model.embed_all(images)
+
+
+class ModelRegistry:
+    _MODELS: Dict[str, SharedModel] = dict()
+    _LOCK = threading.Lock()
+
+    @staticmethod
+    def get_model(
+            model_name: str,
+    ) -> SharedModel:
+        shared_model = ModelRegistry._MODELS.get(model_name)
+
+        if shared_model is None:
+            with ModelRegistry._LOCK:
+                shared_model = ModelRegistry._MODELS.get(model_name)
+
+                if shared_model is None:
+                    shared_model = ModelRegistry.__load_model(
+                        model_name=model_name,
+                    )
+                    ModelRegistry._MODELS[model_name] = shared_model
+
+        return shared_model
+
+    @staticmethod
+    def __load_model(
+            model_name: str,
+    ) -> SharedModel:
+        shared_model = SharedModel(
+            model=foz.load_zoo_model(model_name),
+        )
+        shared_model.embed_all(
+            [np.zeros((*ANALYZER_MODEL_INPUT_SIZE, 3), dtype=np.uint8)],
+        )
+        return shared_model
@@ -0,0 +1,37 @@
+from typing import List
+
+import numpy as np
+
+FLOAT32_SIZE = 4
+
+
+def find_similar_images(
+        embeddings: np.ndarray,
+        threshold: float,
+        memory_limit_mb: int,
+        top_k: int = 0,
+) -> List[np.ndarray]:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    embeddings = embeddings / np.maximum(
+        np.linalg.norm(embeddings, axis=1, keepdims=True),
+        np.finfo(np.float32).eps,
+    )
+    images_amount = len(embeddings)
+    tile_rows_amount = max(1, memory_limit_mb * 1024 * 1024 // max(1, images_amount * FLOAT32_SIZE))
+    similar_images = list()
+
+    for tile_start in range(0, images_amount, tile_rows_amount):
+        similarities = embeddings[tile_start:tile_start + tile_rows_amount] @ embeddings.T
+
+        for row, row_similarities in enumerate(similarities, start=tile_start):
+            row_similarities[row] = -np.inf
+            similar_indexes = np.flatnonzero(row_similarities > threshold)
+
+            if 0 < top_k < len(similar_indexes):
+                similar_indexes = np.sort(
+                    similar_indexes[np.argpartition(row_similarities[similar_indexes], -top_k)[-top_k:]]
+                )
+
+            similar_images.append(similar_indexes)
+
+    return similar_images
@@ -0,0 +1,72 @@
+import asyncio
+from typing import (
+    Any,
+    Dict,
+    Optional,
+    Tuple,
+)
+
+
+class FairQueue:
+
+    def __init__(
+            self,
+            maxsize: int,
+            weights: Optional[Dict[str, int]] = None,
+    ):
+        self.maxsize = maxsize
+        self.weights = weights or dict()
+        self.queues: Dict[str, asyncio.Queue] = dict()
+        self.keys = list()
+        self.cursor = 0
+        self.credits = 0
+        self.available_items = asyncio.Semaphore(0)
+
+    async def put(
+            self,
+            key: str,
+            item: Any,
+    ) -> None:
+        await self.__get_queue(
+            key=key,
+        ).put(item)
+        self.available_items.release()
+
+    async def get(self) -> Tuple[str, Any]:
+        await self.available_items.acquire()
+        key = self.__select_key()
+        return key, self.queues[key].get_nowait()
+
+    def task_done(
+            self,
+            key: str,
+    ) -> None:
+        self.queues[key].task_done()
+
+    async def join(
+            self,
+            key: str,
+    ) -> None:
+        await self.__get_queue(
+            key=key,
+        ).join()
+
+    def __get_queue(
+            self,
+            key: str,
+    ) -> asyncio.Queue:
+        if key not in self.queues:
+            self.queues[key] = asyncio.Queue(
+                maxsize=self.maxsize,
+            )
+            self.keys.append(key)
+
+        return self.queues[key]
+
+    def __select_key(self) -> str:
+        while self.credits <= 0 or self.queues[self.keys[self.cursor]].empty():
+            self.cursor = (self.cursor + 1) % len(self.keys)
+            self.credits = max(1, self.weights.get(self.keys[self.cursor], 1))
+
+        self.credits -= 1
+        return self.keys[self.cursor]
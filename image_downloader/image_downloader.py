@@ -1,9 +1,22 @@
 import asyncio
-import io
+import functools
 import json
+import signal
 import time
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
 from copy import deepcopy
 from logging import INFO
+from types import SimpleNamespace
+from typing import (
+    Any,
+    Callable,
+    Optional,
+    Set,
+)
 from urllib.parse import (
     urlparse,
     unquote,
@@ -15,23 +28,49 @@ import fake_useragent
 
 from config import (
     IMAGES_DOWNLOADER_MAX_REQUEST_RETRIES,
-    PROXY_STRING,
+    IMAGES_DOWNLOADER_REQUESTS_PER_SECOND,
+    IMAGES_DOWNLOADER_CONNECTIONS_LIMIT,
+    IMAGES_DOWNLOADER_CONNECTIONS_PER_HOST_LIMIT,
+    IMAGES_DOWNLOADER_KEEPALIVE_TIMEOUT,
+    IMAGES_DOWNLOADER_DNS_CACHE_TTL,
+    IMAGES_DOWNLOADER_WORKERS_AMOUNT,
+    IMAGES_DOWNLOADER_QUEUE_SIZE,
+    IMAGES_DOWNLOADER_POP_BATCH_SIZE,
+    IMAGES_DOWNLOADER_IMAGE_EXECUTOR,
+    IMAGES_DOWNLOADER_IMAGE_WORKERS_AMOUNT,
+    SCRAPER_INCREMENTAL_MODE,
+    IMAGE_SHARDS_MODE,
+    STAGE_EVENTS_WAIT_TIMEOUT,
+    RATE_LIMITER_BURST,
+    PROXY_STRINGS,
 )
 from constants import (
     RUN_SETTINGS_LIST,
     IS_LAST_PAGE_HANDLED_KEY,
     IS_IMAGES_DOWNLOADED_KEY,
+    IS_FOLDER_ANALYZED_KEY,
     UNIQUE_ADVERTS_KEY,
     INCREMENT_VALUE,
 )
-from image_downloader_constants import (
-    IMAGE_RESIZE_HEIGHT,
-    IMAGE_RESIZE_WIDTH,
-    HEADERS,
+from image_downloader_constants import HEADERS
+from fair_queue import FairQueue
+from image_processor import (
+    ProcessedImage,
+    process_image,
 )
+from utils.image_shards import ImageShards
+from utils.image_store import ImageStore
 from utils.logger import LoggerFactory
-from utils.proxy import Proxy
-from utils.redis_client import RedisClient
+from utils.proxy import ProxyPool
+from utils.rate_limiter import RateLimiter
+from utils.redis_client import AsyncRedisClient
+from utils.retry_policy import (
+    CircuitBreaker,
+    ProxyRejectedError,
+    RetryableStatusError,
+    RetryPolicy,
+)
+from utils.stage_events import StageEvents
 
 
 class ImageDownloader:
@@ -41,119 +80,514 @@ class ImageDownloader:
             name='IMAGE DOWNLOADER',
             log_level=INFO,
         )
-        self.proxy = Proxy.from_string(PROXY_STRING)
+        self.proxy_pool = ProxyPool.from_strings(PROXY_STRINGS)
         self.user_agent_faker = fake_useragent.UserAgent()
-        self.redis_client = RedisClient()
+        self.redis_client = AsyncRedisClient()
+        self.image_store = ImageStore()
+        self.retry_policy = RetryPolicy(
+            max_retries=IMAGES_DOWNLOADER_MAX_REQUEST_RETRIES,
+        )
+        self.rate_limiters = dict()
+        self.image_shards = dict()
+        self.stage_events = StageEvents(
+            redis_client=self.redis_client,
+        )
+        self.image_executor = self.__create_image_executor()
         self.already_downloaded_imgs = dict()
+        self.session = None
+        self.images_queue = None
+        self.producers = dict()
+        self.filter_events = dict()
+        self.stage_events_received = None
+        self.is_evicting = False
+        self.requests_amount = 0
+        self.reused_connections_amount = 0
         self.logger.info('IMAGE DOWNLOADER CREATED')
 
     async def start(self) -> None:
         self.__preset_images_dict()
+        self.session = self.__create_session()
+        await self.stage_events.subscribe_async()
+        self.stage_events_received = asyncio.Event()
+        self.images_queue = FairQueue(
+            maxsize=IMAGES_DOWNLOADER_QUEUE_SIZE,
+            weights={
+                run_settings["filter_name"]: run_settings.get("download_weight", 1)
+                for run_settings in RUN_SETTINGS_LIST
+            },
+        )
+        background_tasks = [
+            asyncio.create_task(
+                self.__consume_images()
+            )
+            for _ in range(IMAGES_DOWNLOADER_WORKERS_AMOUNT)
+        ]
+        background_tasks.append(
+            asyncio.create_task(
+                self.__listen_stage_events()
+            )
+        )
 
-        while True:
-            for run_settings in RUN_SETTINGS_LIST:
+        try:
+            while True:
+                for run_settings in RUN_SETTINGS_LIST:
+                    producer = self.producers.get(run_settings["filter_name"])
 
-                if self.__check_if_already_downloaded(
-                    filter_name=run_settings["filter_name"],
-                ):
-                    continue
+                    if producer and not producer.done():
+                        continue
 
-                await self.__download_images(
-                    run_settings=run_settings,
-                )
+                    if await self.__check_if_already_downloaded(
+                        filter_name=run_settings["filter_name"],
+                    ):
+                        continue
+
+                    self.producers[run_settings["filter_name"]] = asyncio.create_task(
+                        self.__download_images(
+                            run_settings=run_settings,
+                        )
+                    )
+
+                await self.stage_events_received.wait()
+                self.stage_events_received.clear()
+        finally:
+            for task in [*self.producers.values(), *background_tasks]:
+                task.cancel()
+
+            await asyncio.gather(*self.producers.values(), *background_tasks, return_exceptions=True)
+            await self.session.close()
+            await self.redis_client.close()
+            self.image_executor.shutdown()
+            self.logger.info('IMAGE DOWNLOADER SESSION CLOSED')
+
+    @staticmethod
+    def __create_image_executor() -> Executor:
+        if IMAGES_DOWNLOADER_IMAGE_EXECUTOR == 'thread':
+            return ThreadPoolExecutor(
+                max_workers=IMAGES_DOWNLOADER_IMAGE_WORKERS_AMOUNT,
+            )
 
-            time.sleep(5)
+        return ProcessPoolExecutor(
+            max_workers=IMAGES_DOWNLOADER_IMAGE_WORKERS_AMOUNT,
+        )
+
+    def __create_session(self) -> aiohttp.ClientSession:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self.__on_request_start)
+        trace_config.on_connection_reuseconn.append(self.__on_connection_reuse)
+        trace_config.on_request_end.append(self.__on_request_end)
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=IMAGES_DOWNLOADER_CONNECTIONS_LIMIT,
+                limit_per_host=IMAGES_DOWNLOADER_CONNECTIONS_PER_HOST_LIMIT,
+                keepalive_timeout=IMAGES_DOWNLOADER_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=IMAGES_DOWNLOADER_DNS_CACHE_TTL,
+            ),
+            trace_configs=[trace_config],
+        )
+
+    @staticmethod
+    async def __on_request_start(
+            session: aiohttp.ClientSession,
+            trace_config_ctx: SimpleNamespace,
+            params: aiohttp.TraceRequestStartParams,
+    ) -> None:
+        trace_config_ctx.started_at = time.perf_counter()
+        trace_config_ctx.is_connection_reused = False
+
+    @staticmethod
+    async def __on_connection_reuse(
+            session: aiohttp.ClientSession,
+            trace_config_ctx: SimpleNamespace,
+            params: aiohttp.TraceConnectionReuseconnParams,
+    ) -> None:
+        trace_config_ctx.is_connection_reused = True
+
+    async def __on_request_end(
+            self,
+            session: aiohttp.ClientSession,
+            trace_config_ctx: SimpleNamespace,
+            params: aiohttp.TraceRequestEndParams,
+    ) -> None:
+        request_time = (time.perf_counter() - trace_config_ctx.started_at) * 1000
+        self.requests_amount += 1
+        self.reused_connections_amount += trace_config_ctx.is_connection_reused
+        self.logger.info(
+            f'REQUEST TIME: {request_time:.0f} MS | REUSED CONNECTION: {trace_config_ctx.is_connection_reused} '
+            f'| REUSE RATE: {self.reused_connections_amount / self.requests_amount:.2%}'
+        )
 
     async def __download_images(
             self,
             run_settings: dict,
     ) -> None:
-        tasks = list()
-        step = 100
-        notify = False
+        try:
+            await self.__produce_images(
+                filter_name=run_settings["filter_name"],
+            )
+            await self.images_queue.join(
+                key=run_settings["filter_name"],
+            )
+        except Exception:
+            self.logger.exception(f'Cannot download the images | {run_settings["filter_name"]}')
+            return
 
-        while True:
-            is_last_page_handled = self.redis_client.hash_get(
+        if IMAGE_SHARDS_MODE:
+            self.__get_image_shards(
+                filter_name=run_settings["filter_name"],
+            ).flush()
+
+        await self.__notify_images_downloaded(
+            filter_name=run_settings["filter_name"],
+        )
+        await self.__evict_stored_images()
+
+    async def __evict_stored_images(self) -> None:
+        if self.is_evicting:
+            return
+
+        self.is_evicting = True
+
+        try:
+            evicted_images_amount = await self.__run_in_thread(
+                self.image_store.evict,
+                protected_image_ids=await self.__get_pending_analysis_image_ids(),
+            )
+            self.logger.info(f'EVICTED FROM THE IMAGE STORE: {evicted_images_amount}')
+        finally:
+            self.is_evicting = False
+
+    async def __get_pending_analysis_image_ids(self) -> Set[str]:
+        pending_analysis_image_ids = set()
+
+        for run_settings in RUN_SETTINGS_LIST:
+            if not SCRAPER_INCREMENTAL_MODE and await self.redis_client.hash_get(
                 main_key=run_settings["filter_name"],
+                inner_key=IS_FOLDER_ANALYZED_KEY,
+            ) is True:
+                continue
+
+            pending_analysis_image_ids.update(
+                await self.redis_client.set_members(
+                    key=f'{run_settings["filter_name"]}_stored_images',
+                )
+            )
+
+        return pending_analysis_image_ids
+
+    async def __produce_images(
+            self,
+            filter_name: str,
+    ) -> None:
+        filter_event = self.filter_events.setdefault(filter_name, asyncio.Event())
+
+        while True:
+            filter_event.clear()
+            is_last_page_handled = await self.redis_client.hash_get(
+                main_key=filter_name,
                 inner_key=IS_LAST_PAGE_HANDLED_KEY,
             )
-            img_dict_as_str = self.redis_client.left_pop(
-                key=f'{run_settings["filter_name"]}_images'
+            img_dicts_as_str = await self.redis_client.left_pop_many(
+                key=f'{filter_name}_images',
+                count=IMAGES_DOWNLOADER_POP_BATCH_SIZE,
             )
 
-            if img_dict_as_str:
-                img_dict = json.loads(img_dict_as_str)
-                tasks.append(
-                    self.__download_the_image(
-                        img_dict=img_dict,
-                    )
+            if not img_dicts_as_str and is_last_page_handled:
+                return
+
+            if not img_dicts_as_str:
+                try:
+                    await asyncio.wait_for(filter_event.wait(), timeout=STAGE_EVENTS_WAIT_TIMEOUT)
+                except asyncio.TimeoutError:
+                    pass
+
+            for img_dict_as_str in img_dicts_as_str:
+                await self.images_queue.put(
+                    key=filter_name,
+                    item=json.loads(img_dict_as_str),
                 )
-            elif not img_dict_as_str and is_last_page_handled:
-                notify = True
-                break
-            else:
-                break
 
-        for skip in range(0, len(tasks), step):
-            results = await asyncio.gather(*tasks[skip:skip + step])
+    async def __listen_stage_events(self) -> None:
+        while True:
+            stage_events = await self.stage_events.wait_async(
+                timeout=STAGE_EVENTS_WAIT_TIMEOUT,
+            )
+
+            for stage_event in stage_events:
+                if stage_event["filter_name"] in self.filter_events:
+                    self.filter_events[stage_event["filter_name"]].set()
+
+            self.stage_events_received.set()
+
+    async def __consume_images(self) -> None:
+        while True:
+            filter_name, img_dict = await self.images_queue.get()
+
+            try:
+                downloaded = await self.__download_the_image(
+                    img_dict=img_dict,
+                )
 
-            for downloaded in results:
                 if not downloaded:
-                    self.__increment_unique_adverts_amount(
-                        main_key=run_settings["filter_name"],
+                    await self.__increment_unique_adverts_amount(
+                        main_key=filter_name,
                     )
-
-        if notify:
-            self.__notify_images_downloaded(
-                filter_name=run_settings["filter_name"],
-            )
+            except Exception:
+                self.logger.exception(f'Cannot handle the image with url {img_dict["image_url"]} | {filter_name}')
+            finally:
+                self.images_queue.task_done(
+                    key=filter_name,
+                )
 
     async def __download_the_image(
             self,
             img_dict: dict,
     ) -> bool:
-        async with aiohttp.ClientSession() as session:
-            for retry_number in range(IMAGES_DOWNLOADER_MAX_REQUEST_RETRIES):
-                try:
-                    self.logger.info(f'DOWNLOAD: {img_dict["image_url"]} | {img_dict["filter_name"]}')
-                    img_unique_name = unquote(
-                        urlparse(img_dict["image_url"])
-                            .path
-                            .split("/")[-1]
-                    )
-                    filename = f'{img_dict["filter_name"]}/{img_unique_name}'
-
-                    async with session.get(
-                        url=img_dict["image_url"],
-                        headers=self.__create_request_headers(),
-                        timeout=30,
-                    ) as response:
-                        image = Image.open(
-                            io.BytesIO(await response.read())
+        image_id = unquote(
+            urlparse(img_dict["image_url"])
+                .path
+                .split("/")[-1]
+        )
+
+        if await self.__run_in_thread(
+            self.image_store.contains,
+            image_id=image_id,
+        ):
+            self.logger.info(f'ALREADY STORED: {image_id} | {img_dict["filter_name"]}')
+            await self.__handle_stored_image(
+                filter_name=img_dict["filter_name"],
+                image_id=image_id,
+            )
+            return True
+
+        circuit_breaker = CircuitBreaker.for_host(
+            host=urlparse(img_dict["image_url"]).netloc,
+        )
+        rate_limiter = self.__get_rate_limiter(
+            host=urlparse(img_dict["image_url"]).netloc,
+        )
+
+        for retry_number in range(self.retry_policy.max_retries):
+            await circuit_breaker.acquire_async()
+            await rate_limiter.acquire_async()
+            proxy = self.proxy_pool.acquire()
+
+            try:
+                self.logger.info(f'DOWNLOAD: {img_dict["image_url"]} | {img_dict["filter_name"]}')
+                request_started_at = time.perf_counter()
+
+                async with self.session.get(
+                    url=img_dict["image_url"],
+                    headers=self.__create_request_headers(),
+                    proxy=proxy.format() if proxy else None,
+                    timeout=30,
+                ) as response:
+                    if self.retry_policy.is_proxy_rejected_status(
+                        status_code=response.status,
+                        proxy=proxy,
+                    ):
+                        raise ProxyRejectedError(
+                            status_code=response.status,
                         )
-                        image = image.resize(
-                            (
-                                IMAGE_RESIZE_WIDTH,
-                                IMAGE_RESIZE_HEIGHT,
-                            ),
-                            Image.LANCZOS,
+
+                    if self.retry_policy.is_retryable_status(response.status):
+                        raise RetryableStatusError(
+                            status_code=response.status,
+                            retry_after=response.headers.get('retry-after'),
                         )
-                        image.save(filename)
-                        return True
-                except BaseException:
-                    if retry_number + 1 >= IMAGES_DOWNLOADER_MAX_REQUEST_RETRIES:
-                        self.logger.info(
-                            f'Cannot download the image with url {img_dict["image_url"]}'
-                            f' | {img_dict["filter_name"]}'
+
+                    response.raise_for_status()
+                    image_bytes = await response.read()
+
+                circuit_breaker.record_success()
+                self.proxy_pool.report_success(
+                    proxy=proxy,
+                    latency=time.perf_counter() - request_started_at,
+                )
+                break
+            except Exception as e:
+                if isinstance(e, aiohttp.ClientResponseError) and not isinstance(e, aiohttp.ClientHttpProxyError):
+                    circuit_breaker.record_success()
+                    self.logger.info(
+                        f'Cannot download the image with url {img_dict["image_url"]}'
+                        f' | {img_dict["filter_name"]}'
+                    )
+                    return False
+
+                if isinstance(e, (aiohttp.ClientHttpProxyError, ProxyRejectedError)):
+                    self.proxy_pool.report_failure(
+                        proxy=proxy,
+                    )
+                elif isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError, RetryableStatusError)):
+                    circuit_breaker.record_failure()
+                    self.proxy_pool.report_failure(
+                        proxy=proxy,
+                    )
+
+                if self.retry_policy.is_last_retry(retry_number):
+                    self.logger.info(
+                        f'Cannot download the image with url {img_dict["image_url"]}'
+                        f' | {img_dict["filter_name"]}'
+                    )
+                else:
+                    await asyncio.sleep(
+                        self.retry_policy.get_delay(
+                            retry_number=retry_number,
+                            retry_after=getattr(e, 'retry_after', None),
                         )
+                    )
+        else:
+            return False
 
+        try:
+            processed_image = await self.__process_image(
+                image_bytes=image_bytes,
+                encode=True,
+                with_pixels=IMAGE_SHARDS_MODE,
+            )
+            await self.__run_in_thread(
+                self.image_store.put,
+                image_id=image_id,
+                image_bytes=processed_image.image_bytes,
+            )
+        except (
+                OSError,
+                ValueError,
+                Image.DecompressionBombError,
+        ):
+            self.logger.info(
+                f'Cannot decode or store the image with url {img_dict["image_url"]}'
+                f' | {img_dict["filter_name"]}'
+            )
             return False
 
-    def __check_if_already_downloaded(
+        await self.__append_to_image_shards(
+            filter_name=img_dict["filter_name"],
+            image_id=image_id,
+            pixels=processed_image.pixels,
+        )
+        await self.__register_stored_image(
+            filter_name=img_dict["filter_name"],
+            image_id=image_id,
+            image_hash=processed_image.image_hash,
+        )
+        return True
+
+    async def __handle_stored_image(
+            self,
+            filter_name: str,
+            image_id: str,
+    ) -> None:
+        image_hash = await self.redis_client.hash_get(
+            main_key=f'{filter_name}_image_hashes',
+            inner_key=image_id,
+        )
+        with_pixels = IMAGE_SHARDS_MODE and not await self.__get_image_shards(
+            filter_name=filter_name,
+        ).contains_async(
+            image_id=image_id,
+        )
+
+        if image_hash is None or with_pixels:
+            processed_image = await self.__process_image(
+                image_bytes=await self.__run_in_thread(
+                    self.image_store.get,
+                    image_id=image_id,
+                ),
+                encode=False,
+                with_pixels=with_pixels,
+            )
+            image_hash = processed_image.image_hash
+            await self.__append_to_image_shards(
+                filter_name=filter_name,
+                image_id=image_id,
+                pixels=processed_image.pixels,
+            )
+
+        await self.__register_stored_image(
+            filter_name=filter_name,
+            image_id=image_id,
+            image_hash=image_hash,
+        )
+
+    async def __process_image(
+            self,
+            image_bytes: bytes,
+            encode: bool,
+            with_pixels: bool,
+    ) -> ProcessedImage:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.image_executor,
+            functools.partial(
+                process_image,
+                image_bytes=image_bytes,
+                encode=encode,
+                with_pixels=with_pixels,
+            ),
+        )
+
+    @staticmethod
+    async def __run_in_thread(
+            function: Callable,
+            **kwargs,
+    ) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(
+            None,
+            functools.partial(
+                function,
+                **kwargs,
+            ),
+        )
+
+    async def __append_to_image_shards(
+            self,
+            filter_name: str,
+            image_id: str,
+            pixels: Optional[bytes],
+    ) -> None:
+        if pixels is None:
+            return
+
+        await self.__get_image_shards(
+            filter_name=filter_name,
+        ).append_async(
+            image_id=image_id,
+            pixels=pixels,
+        )
+
+    def __get_image_shards(
+            self,
+            filter_name: str,
+    ) -> ImageShards:
+        if filter_name not in self.image_shards:
+            self.image_shards[filter_name] = ImageShards(
+                redis_client=self.redis_client,
+                filter_name=filter_name,
+            )
+
+        return self.image_shards[filter_name]
+
+    async def __register_stored_image(
+            self,
+            filter_name: str,
+            image_id: str,
+            image_hash: int,
+    ) -> None:
+        async with self.redis_client.batch() as redis_batch:
+            redis_batch.set_add(
+                key=f'{filter_name}_stored_images',
+                value=image_id,
+            )
+            redis_batch.hash_set(
+                main_key=f'{filter_name}_image_hashes',
+                inner_key=image_id,
+                value=image_hash,
+            )
+
+    async def __check_if_already_downloaded(
             self,
             filter_name: str,
     ) -> bool:
-        if self.redis_client.hash_get(
+        if await self.redis_client.hash_get(
             main_key=filter_name,
             inner_key=IS_IMAGES_DOWNLOADED_KEY,
         ):
@@ -161,30 +595,48 @@ class ImageDownloader:
         else:
             return False
 
+    def __get_rate_limiter(
+            self,
+            host: str,
+    ) -> RateLimiter:
+        if host not in self.rate_limiters:
+            self.rate_limiters[host] = RateLimiter(
+                redis_client=self.redis_client,
+                host=host,
+                rate=IMAGES_DOWNLOADER_REQUESTS_PER_SECOND,
+                capacity=RATE_LIMITER_BURST,
+            )
+
+        return self.rate_limiters[host]
+
     def __create_request_headers(self) -> dict:
         headers = deepcopy(HEADERS)
         headers["user-agent"] = self.user_agent_faker.random
         return headers
 
-    def __increment_unique_adverts_amount(
+    async def __increment_unique_adverts_amount(
             self,
             main_key: str,
     ):
-        self.redis_client.hash_increase(
+        await self.redis_client.hash_increase(
             main_key=main_key,
             inner_key=UNIQUE_ADVERTS_KEY,
             value=INCREMENT_VALUE,
         )
 
-    def __notify_images_downloaded(
+    async def __notify_images_downloaded(
             self,
             filter_name: str,
     ) -> None:
-        self.redis_client.hash_set(
+        await self.redis_client.hash_set(
             main_key=filter_name,
             inner_key=IS_IMAGES_DOWNLOADED_KEY,
             value=True,
         )
+        await self.stage_events.publish_async(
+            filter_name=filter_name,
+            stage=IS_IMAGES_DOWNLOADED_KEY,
+        )
 
     def __preset_images_dict(self) -> None:
         for run_settings in RUN_SETTINGS_LIST:
@@ -193,4 +645,11 @@ class ImageDownloader:
 
 if __name__ == '__main__':
     image_downloader = ImageDownloader()
-    asyncio.get_event_loop().run_until_complete(image_downloader.start())
+    event_loop = asyncio.get_event_loop()
+    main_task = event_loop.create_task(image_downloader.start())
+    event_loop.add_signal_handler(signal.SIGTERM, main_task.cancel)
+
+    try:
+        event_loop.run_until_complete(main_task)
+    except asyncio.CancelledError:
+        pass
@@ -24,3 +24,5 @@ HEADERS = {
 IMAGE_RESIZE_WIDTH = 600
 
 IMAGE_RESIZE_HEIGHT = 600
+
+IMAGE_REDUCING_GAP = 3.0
@@ -0,0 +1,68 @@
+import io
+from typing import (
+    NamedTuple,
+    Optional,
+)
+
+import PIL.Image as Image
+
+from constants import (
+    ANALYZER_MODEL_INPUT_SIZE,
+    STORED_IMAGE_FORMAT,
+    STORED_IMAGE_QUALITY,
+)
+from image_downloader_constants import IMAGE_REDUCING_GAP
+from utils.perceptual_hash import get_difference_hash
+
+
+class ProcessedImage(NamedTuple):
+    image_hash: int
+    image_bytes: Optional[bytes] = None
+    pixels: Optional[bytes] = None
+
+
+def process_image(
+        image_bytes: bytes,
+        encode: bool = True,
+        with_pixels: bool = False,
+) -> ProcessedImage:
+    image = resize_image(
+        image_bytes=image_bytes,
+    )
+    processed_image = ProcessedImage(
+        image_hash=get_difference_hash(
+            image=image,
+        ),
+        pixels=image.tobytes() if with_pixels else None,
+    )
+
+    if encode:
+        image_buffer = io.BytesIO()
+        image.save(
+            image_buffer,
+            format=STORED_IMAGE_FORMAT,
+            quality=STORED_IMAGE_QUALITY,
+        )
+        processed_image = processed_image._replace(
+            image_bytes=image_buffer.getvalue(),
+        )
+
+    return processed_image
+
+
+def resize_image(
+        image_bytes: bytes,
+) -> Image.Image:
+    image = Image.open(
+        io.BytesIO(image_bytes)
+    )
+    image.draft('RGB', ANALYZER_MODEL_INPUT_SIZE)
+
+    if image.mode == 'RGB' and image.size == ANALYZER_MODEL_INPUT_SIZE:
+        return image
+
+    return image.convert('RGB').resize(
+        ANALYZER_MODEL_INPUT_SIZE,
+        Image.LANCZOS,
+        reducing_gap=IMAGE_REDUCING_GAP,
+    )
@@ -1,10 +1,16 @@
 from celery import Celery
-from config import CELERY_BROKER_URL
+from config import (
+    CELERY_BROKER_URL,
+    SCRAPER_TASK_VISIBILITY_TIMEOUT,
+)
 
 
 scraper_sa_aqar = Celery(
     'scraper_sa_aqar',
     broker=CELERY_BROKER_URL,
 )
+scraper_sa_aqar.conf.broker_transport_options = {
+    'visibility_timeout': SCRAPER_TASK_VISIBILITY_TIMEOUT,
+}
 scraper_sa_aqar.autodiscover_tasks()
 import scraper.tasks
@@ -1,16 +1,38 @@
 import json
-import os
 import random
-import shutil
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 from copy import deepcopy
 from logging import INFO
+from typing import (
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from urllib.parse import urlparse
 
 import fake_useragent
 import requests
+from requests.adapters import HTTPAdapter
 
 from config import (
     SCRAPER_MAX_REQUEST_RETRIES,
-    PROXY_STRING,
+    SCRAPER_CONCURRENT_PAGE_REQUESTS,
+    SCRAPER_INCREMENTAL_MODE,
+    SCRAPER_GEO_TILING_MODE,
+    SCRAPER_TILE_MAX_ADVERTS,
+    SCRAPER_TILE_MAX_DEPTH,
+    SCRAPER_TILE_MAX_MISSED_ADVERTS,
+    SCRAPER_REQUESTS_PER_SECOND,
+    RATE_LIMITER_BURST,
+    PROXY_STRINGS,
 )
 from constants import (
     IS_LAST_PAGE_HANDLED_KEY,
@@ -18,19 +40,44 @@ from constants import (
     INCREMENT_VALUE,
     IS_IMAGES_DOWNLOADED_KEY,
     IS_FOLDER_ANALYZED_KEY,
+    SHARDS_AMOUNT_KEY,
+    LISTING_WATERMARK_KEY,
+    ANALYZED_UNIQUE_IMAGES_KEY,
+    DUPLICATE_ADVERTS_KEY,
+    NEWEST_LISTING_WATERMARK_KEY,
+    SCRAPER_RUN_ID_KEY,
+    ANALYZE_ATTEMPTS_KEY,
+    IMAGES_PUSHED_STAGE,
 )
 from scraper.scraper_constants import (
     ADVERTS_SKIP_INCREMENT_VALUE,
     SA_AQAR_IMAGE_URL_CONTAINER,
+    SA_AQAR_IMAGE_WIDTH,
     ADVERTS_PER_REQUEST_AMOUNT,
     UNIQUE_ADVERTS_INIT_VALUE,
+    CITY_BOUNDING_BOXES,
     GRAPHQL_URL,
     HEADERS,
     JSON,
 )
 from utils.logger import LoggerFactory
-from utils.proxy import Proxy
-from utils.redis_client import RedisClient
+from utils.proxy import (
+    Proxy,
+    ProxyPool,
+)
+from utils.rate_limiter import RateLimiter
+from utils.redis_client import (
+    RedisBatch,
+    RedisClient,
+)
+from utils.retry_policy import (
+    CircuitBreaker,
+    NonRetryableStatusError,
+    ProxyRejectedError,
+    RetryableStatusError,
+    RetryPolicy,
+)
+from utils.stage_events import StageEvents
 
 
 class Scraper:
@@ -40,6 +87,8 @@ class Scraper:
             filter_name: str,
             category_id: int,
             city_id: int,
+            load_preset: bool = True,
+            run_id: Optional[str] = None,
     ):
         self.logger = LoggerFactory.get_logger(
             name='SCRAPER',
@@ -47,25 +96,424 @@ class Scraper:
         )
         self.filter_name = filter_name
         self.adverts_images_list_key = f'{self.filter_name}_images'
+        self.done_shards_key = f'{self.filter_name}_done_shards'
+        self.seen_images_key = f'{self.filter_name}_seen_images'
+        self.seen_listings_key = f'{self.filter_name}_seen_listings'
+        self.stored_images_key = f'{self.filter_name}_stored_images'
+        self.image_shards_index_key = f'{self.filter_name}_image_shards_index'
+        self.image_hashes_key = f'{self.filter_name}_image_hashes'
+        self.handled_pages_key = f'{self.filter_name}_handled_pages'
         self.category_id = category_id
         self.city_id = city_id
         self.redis_client = RedisClient()
-        self.proxy = Proxy.from_string(PROXY_STRING)
+        self.stage_events = StageEvents(
+            redis_client=self.redis_client,
+        )
+        self.listing_watermark = self.__load_listing_watermark()
+        self.proxy_pool = ProxyPool.from_strings(PROXY_STRINGS)
+        self.sessions = {
+            proxy.format(): self.__create_session(
+                proxy=proxy,
+            )
+            for proxy in self.proxy_pool.proxies
+        } or {
+            None: self.__create_session(
+                proxy=None,
+            ),
+        }
+        self.retry_policy = RetryPolicy(
+            max_retries=SCRAPER_MAX_REQUEST_RETRIES,
+        )
+        self.circuit_breaker = CircuitBreaker.for_host(
+            host=urlparse(GRAPHQL_URL).netloc,
+        )
+        self.rate_limiter = RateLimiter(
+            redis_client=self.redis_client,
+            host=urlparse(GRAPHQL_URL).netloc,
+            rate=SCRAPER_REQUESTS_PER_SECOND,
+            capacity=RATE_LIMITER_BURST,
+        )
         self.user_agent_faker = fake_useragent.UserAgent()
-        self.__clean_folder()
-        self.__load_preset()
+        self.request_headers_template = dict(HEADERS)
+        self.request_payload_template = self.__create_request_payload_template()
+
+        self.is_resumed = self.__check_if_resumed(
+            run_id=run_id,
+        )
+
+        if load_preset and not self.is_resumed:
+            self.__load_preset(
+                run_id=run_id,
+            )
+
+        self.handled_pages = set(
+            self.redis_client.set_members(
+                key=self.handled_pages_key,
+            )
+        )
+
+        if self.is_resumed:
+            self.logger.info(f'{self.filter_name.upper()}: RESUMING, HANDLED PAGES: {len(self.handled_pages)}')
+
         self.logger.info('SCRAPER CREATED')
 
     def collect_photos(
             self,
             skip: int = 0,
             page: int = 0,
+    ) -> None:
+        if SCRAPER_GEO_TILING_MODE and not SCRAPER_INCREMENTAL_MODE and self.city_id in CITY_BOUNDING_BOXES:
+            tiled_adverts_amount = self.__collect_pages_by_tiles(
+                bounding_box=CITY_BOUNDING_BOXES[self.city_id],
+            )
+
+            if not self.__collect_adverts_missed_by_tiles(
+                tiled_adverts_amount=tiled_adverts_amount,
+            ):
+                self.__notify_last_page()
+                return
+
+        if SCRAPER_CONCURRENT_PAGE_REQUESTS > 1 and not SCRAPER_INCREMENTAL_MODE:
+            adverts_list, total_adverts_amount = self.__request_page(
+                skip=skip,
+                page=page,
+            )
+            self.__handle_adverts(
+                adverts_list=adverts_list,
+                skip=skip,
+            )
+
+            if adverts_list and total_adverts_amount:
+                skip, page = self.collect_page_range(
+                    skip=skip + ADVERTS_SKIP_INCREMENT_VALUE,
+                    stop=total_adverts_amount,
+                )
+
+        self.collect_remaining_pages(
+            skip=skip,
+            page=page,
+        )
+        self.__notify_last_page()
+
+    def __collect_pages_by_tiles(
+            self,
+            bounding_box: Tuple[float, float, float, float],
+    ) -> int:
+        tiled_adverts_amount = 0
+
+        with ThreadPoolExecutor(
+            max_workers=SCRAPER_CONCURRENT_PAGE_REQUESTS,
+            thread_name_prefix=f'Scraper | {self.filter_name}',
+        ) as executor:
+            pending_futures = {
+                self.__submit_tile_page(
+                    executor=executor,
+                    tile=bounding_box,
+                    skip=0,
+                ): (bounding_box, 0, 0),
+            }
+
+            while pending_futures:
+                done_futures, _ = wait(
+                    pending_futures,
+                    return_when=FIRST_COMPLETED,
+                )
+
+                for future in done_futures:
+                    tile, skip, depth = pending_futures.pop(future)
+                    adverts_list, total_adverts_amount = future.result()
+                    total_adverts_amount = total_adverts_amount or 0
+
+                    if skip == 0 and total_adverts_amount > SCRAPER_TILE_MAX_ADVERTS and \
+                            depth < SCRAPER_TILE_MAX_DEPTH:
+                        for sub_tile in self.__split_tile(
+                            tile=tile,
+                        ):
+                            pending_futures[
+                                self.__submit_tile_page(
+                                    executor=executor,
+                                    tile=sub_tile,
+                                    skip=0,
+                                )
+                            ] = (sub_tile, 0, depth + 1)
+                        continue
+
+                    self.__handle_adverts(
+                        adverts_list=adverts_list,
+                        skip=skip,
+                        tile=tile,
+                    )
+
+                    if skip != 0:
+                        continue
+
+                    tiled_adverts_amount += total_adverts_amount
+                    self.logger.info(
+                        f'{self.filter_name.upper()}: TILE {self.__get_tile_key(tile=tile)} '
+                        f'| DEPTH: {depth} | ADVERTS: {total_adverts_amount}'
+                    )
+
+                    for tile_skip in range(
+                        ADVERTS_SKIP_INCREMENT_VALUE,
+                        total_adverts_amount,
+                        ADVERTS_SKIP_INCREMENT_VALUE,
+                    ):
+                        pending_futures[
+                            self.__submit_tile_page(
+                                executor=executor,
+                                tile=tile,
+                                skip=tile_skip,
+                            )
+                        ] = (tile, tile_skip, depth)
+
+        return tiled_adverts_amount
+
+    def __collect_adverts_missed_by_tiles(
+            self,
+            tiled_adverts_amount: int,
+    ) -> bool:
+        skip = 0
+        total_adverts_amount = None
+        recovered_adverts_amount = 0
+        unlocated_adverts_amount = 0
+
+        while True:
+            adverts_list, page_total_adverts_amount = self.__request_page(
+                skip=skip,
+                page=skip // ADVERTS_SKIP_INCREMENT_VALUE,
+            )
+
+            if total_adverts_amount is None:
+                total_adverts_amount = page_total_adverts_amount or 0
+
+            identified_adverts_list = [advert for advert in adverts_list if advert.get('id') is not None]
+            unseen_adverts_list = [
+                advert
+                for advert, is_seen in zip(
+                    identified_adverts_list,
+                    self.redis_client.hash_exists_many(
+                        main_key=self.seen_listings_key,
+                        inner_keys=[advert['id'] for advert in identified_adverts_list],
+                    ),
+                )
+                if not is_seen
+            ]
+
+            if not unseen_adverts_list:
+                break
+
+            self.__handle_adverts(
+                adverts_list=adverts_list,
+                skip=skip,
+            )
+            recovered_adverts_amount += len(unseen_adverts_list)
+            unlocated_adverts_amount += sum(not advert.get('location') for advert in unseen_adverts_list)
+            skip += ADVERTS_SKIP_INCREMENT_VALUE
+
+        missed_adverts_amount = total_adverts_amount - tiled_adverts_amount - recovered_adverts_amount
+        self.logger.info(
+            f'{self.filter_name.upper()}: TILES ADVERTS: {tiled_adverts_amount}/{total_adverts_amount} '
+            f'| RECOVERED BY PAGING: {recovered_adverts_amount} | WITHOUT LOCATION: {unlocated_adverts_amount}'
+        )
+
+        if missed_adverts_amount <= SCRAPER_TILE_MAX_MISSED_ADVERTS:
+            return False
+
+        self.logger.error(
+            f'{self.filter_name.upper()}: TILES MISSED ADVERTS: {missed_adverts_amount}'
+            f'/{total_adverts_amount}, FALLING BACK TO PAGING'
+        )
+        return True
+
+    def __submit_tile_page(
+            self,
+            executor: ThreadPoolExecutor,
+            tile: Tuple[float, float, float, float],
+            skip: int,
+    ) -> Future:
+        if skip != 0 and self.__get_page_key(skip=skip, tile=tile) in self.handled_pages:
+            future = Future()
+            future.set_result((list(), None))
+            return future
+
+        return executor.submit(
+            self.__request_page,
+            skip=skip,
+            page=skip // ADVERTS_SKIP_INCREMENT_VALUE,
+            tile=tile,
+        )
+
+    @staticmethod
+    def __split_tile(
+            tile: Tuple[float, float, float, float],
+    ) -> List[Tuple[float, float, float, float]]:
+        south, west, north, east = tile
+        middle_lat = (south + north) / 2
+        middle_lng = (west + east) / 2
+        return [
+            (south, west, middle_lat, middle_lng),
+            (south, middle_lng, middle_lat, east),
+            (middle_lat, west, north, middle_lng),
+            (middle_lat, middle_lng, north, east),
+        ]
+
+    @staticmethod
+    def __get_tile_key(
+            tile: Tuple[float, float, float, float],
+    ) -> str:
+        return ','.join(f'{coordinate:.6f}' for coordinate in tile)
+
+    def __get_page_key(
+            self,
+            skip: int,
+            tile: Optional[Tuple[float, float, float, float]] = None,
+    ) -> Union[int, str]:
+        if not tile:
+            return skip
+
+        return f'{self.__get_tile_key(tile=tile)}:{skip}'
+
+    def collect_page_range(
+            self,
+            skip: int,
+            stop: int,
+    ) -> Tuple[int, int]:
+        page_skips = range(
+            skip,
+            stop,
+            ADVERTS_SKIP_INCREMENT_VALUE,
+        )
+        page_skips_to_request = [
+            page_skip for page_skip in page_skips
+            if page_skip not in self.handled_pages
+        ]
+
+        with ThreadPoolExecutor(
+            max_workers=SCRAPER_CONCURRENT_PAGE_REQUESTS,
+            thread_name_prefix=f'Scraper | {self.filter_name}',
+        ) as executor:
+            futures = {
+                executor.submit(
+                    self.__request_page,
+                    skip=page_skip,
+                    page=page_skip // ADVERTS_SKIP_INCREMENT_VALUE,
+                ): page_skip
+                for page_skip in page_skips_to_request
+            }
+
+            for future in as_completed(futures):
+                adverts_list, _ = future.result()
+                self.__handle_adverts(
+                    adverts_list=adverts_list,
+                    skip=futures[future],
+                )
+
+        next_skip = skip + len(page_skips) * ADVERTS_SKIP_INCREMENT_VALUE
+        return next_skip, next_skip // ADVERTS_SKIP_INCREMENT_VALUE
+
+    def collect_remaining_pages(
+            self,
+            skip: int,
+            page: int,
     ) -> None:
         while True:
+            if skip in self.handled_pages:
+                skip += ADVERTS_SKIP_INCREMENT_VALUE
+                page += 1
+                continue
+
+            adverts_list, _ = self.__request_page(
+                skip=skip,
+                page=page,
+            )
+            is_known_listing_reached = self.__handle_adverts(
+                adverts_list=adverts_list,
+                skip=skip,
+            )
+
+            skip += ADVERTS_SKIP_INCREMENT_VALUE
+            page += 1
+
+            if not adverts_list or is_known_listing_reached:
+                break
+
+    def split_into_page_ranges(
+            self,
+            shard_pages_amount: int,
+    ) -> List[Tuple[int, int]]:
+        _, total_adverts_amount = self.__request_page(
+            skip=0,
+            page=0,
+        )
+        total_adverts_amount = total_adverts_amount or 0
+        shard_step = shard_pages_amount * ADVERTS_SKIP_INCREMENT_VALUE
+        page_ranges = [
+            (shard_skip, min(shard_skip + shard_step, total_adverts_amount))
+            for shard_skip in range(0, total_adverts_amount, shard_step)
+        ] or [(0, 0)]
+
+        self.logger.info(f'{self.filter_name.upper()}: SPLIT INTO SHARDS: {len(page_ranges)}')
+        return page_ranges
+
+    def check_if_shards_dispatched(self) -> bool:
+        return bool(
+            self.redis_client.hash_get(
+                main_key=self.filter_name,
+                inner_key=SHARDS_AMOUNT_KEY,
+            )
+        )
+
+    def register_dispatched_shards(
+            self,
+            shards_amount: int,
+    ) -> None:
+        self.redis_client.hash_set(
+            main_key=self.filter_name,
+            inner_key=SHARDS_AMOUNT_KEY,
+            value=shards_amount,
+        )
+        self.__notify_last_page_if_all_shards_done(
+            done_shards_amount=self.redis_client.set_size(
+                key=self.done_shards_key,
+            ),
+        )
+
+    def report_shard_done(
+            self,
+            shard_number: int,
+    ) -> None:
+        self.__notify_last_page_if_all_shards_done(
+            done_shards_amount=self.redis_client.set_add_and_count(
+                key=self.done_shards_key,
+                value=shard_number,
+            ),
+        )
+
+    def __notify_last_page_if_all_shards_done(
+            self,
+            done_shards_amount: int,
+    ) -> None:
+        shards_amount = self.redis_client.hash_get(
+            main_key=self.filter_name,
+            inner_key=SHARDS_AMOUNT_KEY,
+        )
+        self.logger.info(f'{self.filter_name.upper()}: SHARDS DONE: {done_shards_amount}/{shards_amount}')
+
+        if shards_amount and done_shards_amount >= shards_amount:
+            self.__notify_last_page()
+
+    def __request_page(
+            self,
+            skip: int,
+            page: int,
+            tile: Optional[Tuple[float, float, float, float]] = None,
+    ) -> Tuple[list, Optional[int]]:
+        for retry_number in range(self.retry_policy.max_retries):
             try:
                 self.logger.info(f'{self.filter_name.upper()}: HANDLING PAGE: {page}')
                 response = self.__send_page_request(
                     skip=skip,
+                    tile=tile,
                 )
                 response_json_body = response.json()
                 adverts_list = response_json_body\
@@ -79,37 +527,193 @@ class Scraper:
                     .get('find', {})\
                     .get('total')
                 self.logger.info(f'{self.filter_name.upper()}: TOTAL ADVERTS AMOUNT: {total_adverts_amount}')
-            except ValueError:
-                continue
+                return adverts_list, total_adverts_amount
+            except ValueError as e:
+                if self.retry_policy.is_last_retry(retry_number):
+                    raise e
+
+                time.sleep(
+                    self.retry_policy.get_delay(
+                        retry_number=retry_number,
+                    )
+                )
+
+    def __save_listing_watermark(self) -> None:
+        newest_listing_watermark = self.redis_client.hash_get(
+            main_key=self.filter_name,
+            inner_key=NEWEST_LISTING_WATERMARK_KEY,
+        )
+
+        if newest_listing_watermark:
+            self.redis_client.hash_set(
+                main_key=self.filter_name,
+                inner_key=LISTING_WATERMARK_KEY,
+                value=newest_listing_watermark,
+            )
+
+    def __handle_adverts(
+            self,
+            adverts_list: list,
+            skip: int,
+            tile: Optional[Tuple[float, float, float, float]] = None,
+    ) -> bool:
+        page_key = self.__get_page_key(
+            skip=skip,
+            tile=tile,
+        )
+
+        if page_key in self.handled_pages:
+            return False
+
+        new_adverts_list = [
+            advert for advert in adverts_list
+            if self.__check_if_new_listing(
+                advert=advert,
+            )
+        ]
+        listings_items = [
+            (self.seen_listings_key, advert['id'], page_key)
+            for advert in new_adverts_list
+            if advert.get('id') is not None
+        ]
+        main_images_items = [
+            (self.seen_images_key, advert['imgs'][0], advert.get('id'))
+            for advert in new_adverts_list
+            if advert.get('imgs')
+        ]
+        owners = self.redis_client.hash_set_if_missing_many(
+            items=listings_items + main_images_items,
+        )
+        listings_owners = {
+            listing_id: owner
+            for (_, listing_id, _), owner in zip(listings_items, owners)
+        }
+        main_images_owners = iter(owners[len(listings_items):])
+
+        with self.redis_client.batch() as redis_batch:
+            for advert in new_adverts_list:
+                is_duplicate_image = bool(advert.get('imgs')) and next(main_images_owners) != advert.get('id')
+
+                if listings_owners.get(advert.get('id'), page_key) != page_key:
+                    continue
 
-            for advert in adverts_list:
                 self.handle_advert(
                     advert=advert,
+                    redis_writer=redis_batch,
+                    is_duplicate_image=is_duplicate_image,
                 )
 
-            skip += ADVERTS_SKIP_INCREMENT_VALUE
-            page += 1
+            if skip == 0 and not tile:
+                redis_batch.hash_set(
+                    main_key=self.filter_name,
+                    inner_key=NEWEST_LISTING_WATERMARK_KEY,
+                    value=self.__get_newest_listing_watermark(
+                        adverts_list=new_adverts_list,
+                    ),
+                )
 
-            if not adverts_list:
-                self.__notify_last_page()
-                break
+            if adverts_list:
+                redis_batch.set_add(
+                    key=self.handled_pages_key,
+                    value=page_key,
+                )
+
+            if new_adverts_list:
+                self.stage_events.publish(
+                    filter_name=self.filter_name,
+                    stage=IMAGES_PUSHED_STAGE,
+                    redis_writer=redis_batch,
+                )
+
+        if adverts_list:
+            self.handled_pages.add(page_key)
+
+        return len(new_adverts_list) < len(adverts_list)
+
+    def __check_if_new_listing(
+            self,
+            advert: dict,
+    ) -> bool:
+        if not SCRAPER_INCREMENTAL_MODE or not self.listing_watermark:
+            return True
+
+        create_time = advert.get('create_time')
+
+        if create_time is None:
+            return True
+        elif create_time == self.listing_watermark['create_time']:
+            return advert.get('id') not in self.listing_watermark['ids']
+        else:
+            return create_time > self.listing_watermark['create_time']
+
+    def __get_newest_listing_watermark(
+            self,
+            adverts_list: list,
+    ) -> Optional[dict]:
+        create_times = [
+            advert['create_time']
+            for advert in adverts_list
+            if advert.get('create_time') is not None
+        ]
+
+        if not create_times:
+            return None
+
+        newest_listing_ids = [
+            advert.get('id')
+            for advert in adverts_list
+            if advert.get('create_time') == max(create_times)
+        ]
+
+        if self.listing_watermark and self.listing_watermark['create_time'] == max(create_times):
+            newest_listing_ids = self.listing_watermark['ids'] + [
+                listing_id
+                for listing_id in newest_listing_ids
+                if listing_id not in self.listing_watermark['ids']
+            ]
+
+        return {
+            'create_time': max(create_times),
+            'ids': newest_listing_ids,
+        }
+
+    def __load_listing_watermark(self) -> Optional[dict]:
+        if not SCRAPER_INCREMENTAL_MODE:
+            return None
+
+        return self.redis_client.hash_get(
+            main_key=self.filter_name,
+            inner_key=LISTING_WATERMARK_KEY,
+        )
 
     def handle_advert(
             self,
             advert: dict,
+            redis_writer: Optional[Union[RedisClient, RedisBatch]] = None,
+            is_duplicate_image: bool = False,
     ) -> None:
+        redis_writer = redis_writer or self.redis_client
         advert_images = advert.get('imgs', list())
-        if advert_images:
+        if advert_images and is_duplicate_image:
+            redis_writer.hash_increase(
+                main_key=self.filter_name,
+                inner_key=DUPLICATE_ADVERTS_KEY,
+                value=INCREMENT_VALUE,
+            )
+        elif advert_images:
             img_dict = {
                 'filter_name': self.filter_name,
-                'image_url': SA_AQAR_IMAGE_URL_CONTAINER.format(image_id=advert_images[0]),
+                'image_url': SA_AQAR_IMAGE_URL_CONTAINER.format(
+                    image_width=SA_AQAR_IMAGE_WIDTH,
+                    image_id=advert_images[0],
+                ),
             }
-            self.redis_client.left_push(
+            redis_writer.left_push(
                 key=self.adverts_images_list_key,
                 value=json.dumps(img_dict),
             )
         else:
-            self.redis_client.hash_increase(
+            redis_writer.hash_increase(
                 main_key=self.filter_name,
                 inner_key=UNIQUE_ADVERTS_KEY,
                 value=INCREMENT_VALUE,
@@ -118,30 +722,143 @@ class Scraper:
     def __send_page_request(
             self,
             skip: int,
+            tile: Optional[Tuple[float, float, float, float]] = None,
     ) -> requests.Response:
-        for retry_number in range(SCRAPER_MAX_REQUEST_RETRIES):
+        for retry_number in range(self.retry_policy.max_retries):
+            self.circuit_breaker.acquire()
+            self.rate_limiter.acquire()
+            proxy = self.proxy_pool.acquire()
+
             try:
-                return requests.post(
+                request_started_at = time.perf_counter()
+                response = self.sessions[proxy.format() if proxy else None].post(
                     url=GRAPHQL_URL,
                     headers=self.__create_request_headers(),
-                    proxies=self.proxy.as_dict(),
                     data=self.__create_request_payload(
                         skip=skip,
+                        tile=tile,
                     ),
                 )
-            except BaseException as e:
-                if retry_number + 1 >= SCRAPER_MAX_REQUEST_RETRIES:
+                request_latency = time.perf_counter() - request_started_at
+                self.logger.info(
+                    f'{self.filter_name.upper()}: REQUEST LATENCY: {request_latency * 1000:.0f} MS | SKIP: {skip}'
+                )
+
+                if self.retry_policy.is_proxy_rejected_status(
+                    status_code=response.status_code,
+                    proxy=proxy,
+                ):
+                    raise ProxyRejectedError(
+                        status_code=response.status_code,
+                    )
+
+                if self.retry_policy.is_retryable_status(response.status_code):
+                    raise RetryableStatusError(
+                        status_code=response.status_code,
+                        retry_after=response.headers.get('retry-after'),
+                    )
+
+                if not response.ok:
+                    raise NonRetryableStatusError(
+                        status_code=response.status_code,
+                    )
+
+                self.circuit_breaker.record_success()
+                self.proxy_pool.report_success(
+                    proxy=proxy,
+                    latency=request_latency,
+                )
+                return response
+            except (
+                    requests.RequestException,
+                    RetryableStatusError,
+                    ProxyRejectedError,
+            ) as e:
+                if not isinstance(e, ProxyRejectedError):
+                    self.circuit_breaker.record_failure()
+
+                self.proxy_pool.report_failure(
+                    proxy=proxy,
+                )
+
+                if self.retry_policy.is_last_retry(retry_number):
                     raise e
 
-    def __load_preset(self) -> None:
+                time.sleep(
+                    self.retry_policy.get_delay(
+                        retry_number=retry_number,
+                        retry_after=getattr(e, 'retry_after', None),
+                    )
+                )
+
+    def __check_if_resumed(
+            self,
+            run_id: Optional[str],
+    ) -> bool:
+        if not run_id:
+            return False
+
+        return self.redis_client.hash_get(
+            main_key=self.filter_name,
+            inner_key=SCRAPER_RUN_ID_KEY,
+        ) == run_id
+
+    def __load_preset(
+            self,
+            run_id: Optional[str],
+    ) -> None:
         self.redis_client.remove(
             key=self.adverts_images_list_key,
         )
+        self.redis_client.remove(
+            key=self.done_shards_key,
+        )
+        self.redis_client.remove(
+            key=self.handled_pages_key,
+        )
         self.redis_client.hash_set(
             main_key=self.filter_name,
-            inner_key=UNIQUE_ADVERTS_KEY,
-            value=UNIQUE_ADVERTS_INIT_VALUE,
+            inner_key=SHARDS_AMOUNT_KEY,
+            value=None,
         )
+        self.redis_client.hash_set(
+            main_key=self.filter_name,
+            inner_key=NEWEST_LISTING_WATERMARK_KEY,
+            value=None,
+        )
+
+        if not SCRAPER_INCREMENTAL_MODE or not self.listing_watermark:
+            self.redis_client.remove(
+                key=self.seen_images_key,
+            )
+            self.redis_client.remove(
+                key=self.seen_listings_key,
+            )
+            self.redis_client.remove(
+                key=self.stored_images_key,
+            )
+            self.redis_client.remove(
+                key=self.image_shards_index_key,
+            )
+            self.redis_client.remove(
+                key=self.image_hashes_key,
+            )
+            self.redis_client.hash_set(
+                main_key=self.filter_name,
+                inner_key=UNIQUE_ADVERTS_KEY,
+                value=UNIQUE_ADVERTS_INIT_VALUE,
+            )
+            self.redis_client.hash_set(
+                main_key=self.filter_name,
+                inner_key=ANALYZED_UNIQUE_IMAGES_KEY,
+                value=UNIQUE_ADVERTS_INIT_VALUE,
+            )
+            self.redis_client.hash_set(
+                main_key=self.filter_name,
+                inner_key=DUPLICATE_ADVERTS_KEY,
+                value=UNIQUE_ADVERTS_INIT_VALUE,
+            )
+
         self.redis_client.hash_set(
             main_key=self.filter_name,
             inner_key=IS_LAST_PAGE_HANDLED_KEY,
@@ -157,55 +874,83 @@ class Scraper:
             inner_key=IS_FOLDER_ANALYZED_KEY,
             value=False,
         )
+        self.redis_client.hash_set(
+            main_key=self.filter_name,
+            inner_key=ANALYZE_ATTEMPTS_KEY,
+            value=0,
+        )
+        self.redis_client.hash_set(
+            main_key=self.filter_name,
+            inner_key=SCRAPER_RUN_ID_KEY,
+            value=run_id,
+        )
         self.logger.info('PRESET IS LOADED TO REDIS DB')
 
-    def __clean_folder(self) -> None:
-        self.__remove_folder()
-        self.__create_empty_folder()
-
-    def __remove_folder(self) -> None:
-        try:
-            for filename in os.listdir(self.filter_name):
-                file_path = os.path.join(self.filter_name, filename)
-                try:
-                    if os.path.isfile(file_path) or os.path.islink(file_path):
-                        os.unlink(file_path)
-                    elif os.path.isdir(file_path):
-                        shutil.rmtree(file_path)
-                except Exception:
-                    pass
-        except FileNotFoundError:
-            pass
-        except shutil.Error:
-            pass
-
-    def __create_empty_folder(self) -> None:
-        try:
-            if not os.path.isdir(self.filter_name):
-                os.mkdir(self.filter_name)
-        except OSError:
-            pass
-
     def __notify_last_page(self) -> None:
+        self.__save_listing_watermark()
         self.redis_client.hash_set(
             main_key=self.filter_name,
             inner_key=IS_LAST_PAGE_HANDLED_KEY,
             value=True,
         )
+        self.stage_events.publish(
+            filter_name=self.filter_name,
+            stage=IS_LAST_PAGE_HANDLED_KEY,
+        )
+
+    @staticmethod
+    def __create_session(
+            proxy: Optional[Proxy],
+    ) -> requests.Session:
+        session = requests.Session()
+        session.mount(
+            prefix='https://',
+            adapter=HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=max(SCRAPER_CONCURRENT_PAGE_REQUESTS, 1),
+            ),
+        )
+
+        if proxy:
+            session.proxies.update(proxy.as_dict())
+
+        return session
 
     def __create_request_headers(self) -> dict:
-        headers = deepcopy(HEADERS)
-        headers['referer'] = headers['referer'].format(random.randint(1, 2500))
-        headers['user-agent'] = self.user_agent_faker.random
-        return headers
+        return {
+            **self.request_headers_template,
+            'referer': self.request_headers_template['referer'].format(random.randint(1, 2500)),
+            'user-agent': self.user_agent_faker.random,
+        }
 
-    def __create_request_payload(
-            self,
-            skip: int,
-    ) -> str:
+    def __create_request_payload_template(self) -> dict:
         payload_dict = deepcopy(JSON)
         payload_dict['variables']['size'] = ADVERTS_PER_REQUEST_AMOUNT
-        payload_dict['variables']['from'] = skip
         payload_dict['variables']['where']['category']['eq'] = self.category_id
         payload_dict['variables']['where']['city_id']['eq'] = self.city_id
+        return payload_dict
+
+    def __create_request_payload(
+            self,
+            skip: int,
+            tile: Optional[Tuple[float, float, float, float]] = None,
+    ) -> str:
+        payload_dict = {
+            **self.request_payload_template,
+            'variables': {
+                **self.request_payload_template['variables'],
+                'from': skip,
+            },
+        }
+
+        if tile:
+            south, west, north, east = tile
+            payload_dict['variables']['polygon'] = [
+                {'lat': south, 'lng': west},
+                {'lat': north, 'lng': west},
+                {'lat': north, 'lng': east},
+                {'lat': south, 'lng': east},
+                {'lat': south, 'lng': west},
+            ]
+
         return json.dumps(payload_dict)
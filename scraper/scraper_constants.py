@@ -1,3 +1,6 @@
+from constants import ANALYZER_MODEL_INPUT_SIZE
+
+
 # URLS
 
 GRAPHQL_URL = 'https://sa.aqar.fm/graphql'
@@ -5,7 +8,14 @@ GRAPHQL_URL = 'https://sa.aqar.fm/graphql'
 
 # URLS CONTAINERS
 
-SA_AQAR_IMAGE_URL_CONTAINER = 'https://images.aqar.fm/webp/300x0/props/{image_id}'
+SA_AQAR_IMAGE_URL_CONTAINER = 'https://images.aqar.fm/webp/{image_width}x0/props/{image_id}'
+
+SA_AQAR_IMAGE_WIDTHS = (300, 600)
+
+SA_AQAR_IMAGE_WIDTH = min(
+    (image_width for image_width in SA_AQAR_IMAGE_WIDTHS if image_width >= ANALYZER_MODEL_INPUT_SIZE[0]),
+    default=max(SA_AQAR_IMAGE_WIDTHS),
+)
 
 
 # PAYLOADS
@@ -77,3 +87,11 @@ ADVERTS_PER_REQUEST_AMOUNT = 50
 ADVERTS_SKIP_INCREMENT_VALUE = 50
 
 UNIQUE_ADVERTS_INIT_VALUE = 0
+
+
+# GEO TILING CONSTANTS
+
+CITY_BOUNDING_BOXES = {
+    21: (24.2, 46.2, 25.3, 47.3),
+    66: (21.1, 38.9, 22.1, 39.5),
+}
@@ -1,9 +1,20 @@
+from config import (
+    SCRAPER_SHARD_PAGES_AMOUNT,
+    SCRAPER_INCREMENTAL_MODE,
+    SCRAPER_GEO_TILING_MODE,
+)
 from .celery_app import scraper_sa_aqar
 from .scraper import Scraper
 
 
-@scraper_sa_aqar.task(name='collect_photos')
+@scraper_sa_aqar.task(
+    name='collect_photos',
+    bind=True,
+    acks_late=True,
+    reject_on_worker_lost=True,
+)
 def collect_photos(
+        self,
         filter_name: str,
         category_id: int,
         city_id: int,
@@ -12,5 +23,66 @@ def collect_photos(
         filter_name=filter_name,
         category_id=category_id,
         city_id=city_id,
+        run_id=self.request.id,
+    )
+
+    if SCRAPER_SHARD_PAGES_AMOUNT > 0 and not (SCRAPER_INCREMENTAL_MODE or SCRAPER_GEO_TILING_MODE):
+        if scraper.is_resumed and scraper.check_if_shards_dispatched():
+            return
+
+        page_ranges = scraper.split_into_page_ranges(
+            shard_pages_amount=SCRAPER_SHARD_PAGES_AMOUNT,
+        )
+
+        for shard_number, (skip, stop) in enumerate(page_ranges):
+            collect_photos_shard.delay(
+                filter_name=filter_name,
+                category_id=category_id,
+                city_id=city_id,
+                shard_number=shard_number,
+                skip=skip,
+                stop=stop,
+                is_last_shard=shard_number + 1 == len(page_ranges),
+            )
+
+        scraper.register_dispatched_shards(
+            shards_amount=len(page_ranges),
+        )
+    else:
+        scraper.collect_photos()
+
+
+@scraper_sa_aqar.task(
+    name='collect_photos_shard',
+    acks_late=True,
+    reject_on_worker_lost=True,
+)
+def collect_photos_shard(
+        filter_name: str,
+        category_id: int,
+        city_id: int,
+        shard_number: int,
+        skip: int,
+        stop: int,
+        is_last_shard: bool,
+) -> None:
+    scraper = Scraper(
+        filter_name=filter_name,
+        category_id=category_id,
+        city_id=city_id,
+        load_preset=False,
+    )
+    next_skip, next_page = scraper.collect_page_range(
+        skip=skip,
+        stop=stop,
+    )
+
+    if is_last_shard:
+        scraper.collect_remaining_pages(
+            skip=next_skip,
+            page=next_page,
+        )
+
+    scraper.report_shard_done(
+        shard_number=shard_number,
     )
-    scraper.collect_photos()
@@ -0,0 +1,141 @@
+import os
+from typing import (
+    Iterator,
+    List,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+from config import (
+    IMAGE_SHARDS_FOLDER,
+    IMAGE_SHARD_CAPACITY,
+)
+from constants import ANALYZER_MODEL_INPUT_SIZE
+from utils.redis_client import (
+    AsyncRedisClient,
+    RedisClient,
+)
+
+RESERVE_POSITION_SCRIPT = """
+if redis.call('HEXISTS', KEYS[1], ARGV[1]) == 1 then
+    return -1
+end
+local position = redis.call('HLEN', KEYS[1])
+redis.call('HSET', KEYS[1], ARGV[1], position)
+return position
+"""
+
+
+class ImageShards:
+    CHANNELS_AMOUNT = 3
+
+    def __init__(
+            self,
+            redis_client: Union[RedisClient, AsyncRedisClient],
+            filter_name: str,
+            folder: str = IMAGE_SHARDS_FOLDER,
+            shard_capacity: int = IMAGE_SHARD_CAPACITY,
+            image_size: Tuple[int, int] = ANALYZER_MODEL_INPUT_SIZE,
+    ):
+        self.redis_client = redis_client
+        self.folder = os.path.join(folder, filter_name)
+        self.shard_capacity = shard_capacity
+        self.image_shape = (image_size[1], image_size[0], self.CHANNELS_AMOUNT)
+        self.index_key = f'{filter_name}_image_shards_index'
+        self.writable_shards = dict()
+        self._reserve_position_script = redis_client.register_script(
+            script=RESERVE_POSITION_SCRIPT,
+        )
+        os.makedirs(self.folder, exist_ok=True)
+
+    async def contains_async(
+            self,
+            image_id: str,
+    ) -> bool:
+        return await self.redis_client.hash_get(
+            main_key=self.index_key,
+            inner_key=image_id,
+        ) is not None
+
+    async def append_async(
+            self,
+            image_id: str,
+            pixels: bytes,
+    ) -> None:
+        position = await self._reserve_position_script(
+            keys=[self.index_key],
+            args=[image_id],
+        )
+
+        if position < 0:
+            return
+
+        shard_number, offset = divmod(position, self.shard_capacity)
+        shard = self.__get_writable_shard(
+            shard_number=shard_number,
+        )
+        shard[offset] = np.frombuffer(pixels, dtype=np.uint8).reshape(self.image_shape)
+
+    def flush(self) -> None:
+        for shard in self.writable_shards.values():
+            shard.flush()
+
+    def get_image_ids(self) -> List[str]:
+        positions = self.redis_client.hash_get_all(
+            main_key=self.index_key,
+        )
+        return sorted(positions, key=positions.get)
+
+    def read_batches(
+            self,
+            batch_size: int,
+    ) -> Iterator[Tuple[List[str], np.ndarray]]:
+        image_ids = self.get_image_ids()
+
+        for shard_start in range(0, len(image_ids), self.shard_capacity):
+            shard = np.load(
+                self.__get_shard_path(
+                    shard_number=shard_start // self.shard_capacity,
+                ),
+                mmap_mode='r',
+            )
+            shard_image_ids = image_ids[shard_start:shard_start + self.shard_capacity]
+
+            for batch_start in range(0, len(shard_image_ids), batch_size):
+                yield (
+                    shard_image_ids[batch_start:batch_start + batch_size],
+                    shard[batch_start:batch_start + batch_size],
+                )
+
+    def __get_writable_shard(
+            self,
+            shard_number: int,
+    ) -> np.memmap:
+        if shard_number not in self.writable_shards:
+            path = self.__get_shard_path(
+                shard_number=shard_number,
+            )
+            shard = None
+
+            if os.path.isfile(path):
+                shard = np.lib.format.open_memmap(path, mode='r+')
+
+            if shard is None or shard.shape != (self.shard_capacity, *self.image_shape):
+                shard = np.lib.format.open_memmap(
+                    path,
+                    mode='w+',
+                    dtype=np.uint8,
+                    shape=(self.shard_capacity, *self.image_shape),
+                )
+
+            self.writable_shards[shard_number] = shard
+
+        return self.writable_shards[shard_number]
+
+    def __get_shard_path(
+            self,
+            shard_number: int,
+    ) -> str:
+        return os.path.join(self.folder, f'shard_{shard_number:05d}.npy')
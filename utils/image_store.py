@@ -0,0 +1,132 @@
+import hashlib
+import os
+import tempfile
+from typing import (
+    Optional,
+    Set,
+)
+
+from config import (
+    IMAGE_STORE_FOLDER,
+    IMAGE_STORE_MAX_SIZE_MB,
+)
+
+
+class ImageStore:
+    SHARD_PREFIX_LENGTH = 2
+    SHARD_LEVELS_AMOUNT = 2
+
+    def __init__(
+            self,
+            folder: str = IMAGE_STORE_FOLDER,
+            max_size: Optional[int] = IMAGE_STORE_MAX_SIZE_MB * 1024 * 1024,
+    ):
+        self.folder = folder
+        self.max_size = max_size
+        os.makedirs(self.folder, exist_ok=True)
+
+    def get_path(
+            self,
+            image_id: str,
+    ) -> str:
+        digest = hashlib.sha1(image_id.encode()).hexdigest()
+        shard_folders = [
+            digest[level * self.SHARD_PREFIX_LENGTH:(level + 1) * self.SHARD_PREFIX_LENGTH]
+            for level in range(self.SHARD_LEVELS_AMOUNT)
+        ]
+        return os.path.join(self.folder, *shard_folders, image_id)
+
+    def contains(
+            self,
+            image_id: str,
+    ) -> bool:
+        try:
+            os.utime(
+                self.get_path(
+                    image_id=image_id,
+                )
+            )
+            return True
+        except FileNotFoundError:
+            return False
+
+    def get(
+            self,
+            image_id: str,
+    ) -> bytes:
+        with open(
+            self.get_path(
+                image_id=image_id,
+            ),
+            'rb',
+        ) as stored_file:
+            return stored_file.read()
+
+    def put(
+            self,
+            image_id: str,
+            image_bytes: bytes,
+    ) -> str:
+        path = self.get_path(
+            image_id=image_id,
+        )
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=folder,
+            prefix='.tmp_',
+        )
+
+        try:
+            with os.fdopen(file_descriptor, 'wb') as temporary_file:
+                temporary_file.write(image_bytes)
+
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+
+        return path
+
+    def evict(
+            self,
+            protected_image_ids: Optional[Set[str]] = None,
+    ) -> int:
+        if not self.max_size:
+            return 0
+
+        protected_image_ids = protected_image_ids or set()
+
+        stored_files = list()
+        total_size = 0
+
+        for folder, _, filenames in os.walk(self.folder):
+            for filename in filenames:
+                path = os.path.join(folder, filename)
+
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+                stored_files.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+        evicted_files_amount = 0
+
+        for _, size, path in sorted(stored_files):
+            if total_size <= self.max_size:
+                break
+
+            if os.path.basename(path) in protected_image_ids:
+                continue
+
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+            total_size -= size
+            evicted_files_amount += 1
+
+        return evicted_files_amount
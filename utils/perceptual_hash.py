@@ -0,0 +1,133 @@
+from collections import defaultdict
+from typing import (
+    List,
+    Tuple,
+)
+
+import PIL.Image as Image
+
+HASH_SIZE = 8
+
+HASH_BITS_AMOUNT = HASH_SIZE * HASH_SIZE
+
+
+def get_difference_hash(
+        image: Image.Image,
+) -> int:
+    pixels = list(
+        image
+        .convert('L')
+        .resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+        .getdata()
+    )
+    image_hash = 0
+
+    for row in range(HASH_SIZE):
+        for column in range(HASH_SIZE):
+            left_pixel = pixels[row * (HASH_SIZE + 1) + column]
+            right_pixel = pixels[row * (HASH_SIZE + 1) + column + 1]
+            image_hash = image_hash << 1 | (left_pixel > right_pixel)
+
+    return image_hash
+
+
+def get_hamming_distance(
+        first_hash: int,
+        second_hash: int,
+) -> int:
+    return bin(first_hash ^ second_hash).count('1')
+
+
+class PerceptualHashIndex:
+
+    def __init__(
+            self,
+            max_distance: int,
+    ):
+        self.max_distance = max_distance
+        self.bands = self.__create_bands(
+            bands_amount=max_distance + 1,
+        )
+        self.hashes = dict()
+        self.parents = dict()
+        self.exact_hashes = dict()
+        self.band_buckets = defaultdict(list)
+
+    def add(
+            self,
+            image_id: str,
+            image_hash: int,
+    ) -> None:
+        self.hashes[image_id] = image_hash
+        self.parents[image_id] = image_id
+
+        if image_hash in self.exact_hashes:
+            self.__union(
+                first_image_id=self.exact_hashes[image_hash],
+                second_image_id=image_id,
+            )
+            return
+
+        self.exact_hashes[image_hash] = image_id
+
+        for band_number, (shift, mask) in enumerate(self.bands):
+            bucket = self.band_buckets[band_number, image_hash >> shift & mask]
+
+            for other_image_id in bucket:
+                if get_hamming_distance(
+                    first_hash=image_hash,
+                    second_hash=self.hashes[other_image_id],
+                ) <= self.max_distance:
+                    self.__union(
+                        first_image_id=other_image_id,
+                        second_image_id=image_id,
+                    )
+
+            bucket.append(image_id)
+
+    def get_groups(self) -> List[List[str]]:
+        groups = defaultdict(list)
+
+        for image_id in self.hashes:
+            groups[self.__find(image_id=image_id)].append(image_id)
+
+        return list(groups.values())
+
+    def __find(
+            self,
+            image_id: str,
+    ) -> str:
+        while self.parents[image_id] != image_id:
+            self.parents[image_id] = self.parents[self.parents[image_id]]
+            image_id = self.parents[image_id]
+
+        return image_id
+
+    def __union(
+            self,
+            first_image_id: str,
+            second_image_id: str,
+    ) -> None:
+        first_root = self.__find(
+            image_id=first_image_id,
+        )
+        second_root = self.__find(
+            image_id=second_image_id,
+        )
+
+        if first_root != second_root:
+            self.parents[second_root] = first_root
+
+    @staticmethod
+    def __create_bands(
+            bands_amount: int,
+    ) -> List[Tuple[int, int]]:
+        bands = list()
+        shift = 0
+
+        for band_number in range(bands_amount):
+            band_bits_amount = HASH_BITS_AMOUNT // bands_amount + (band_number < HASH_BITS_AMOUNT % bands_amount)
+            bands.append((shift, (1 << band_bits_amount) - 1))
+            shift += band_bits_amount
+
+        return bands
@@ -1,3 +1,16 @@
+import random
+import threading
+import time
+from typing import (
+    List,
+    Optional,
+)
+
+from config import (
+    PROXY_QUARANTINE_FAILURES_AMOUNT,
+    PROXY_QUARANTINE_TIME,
+)
+
 
 class Proxy:
 
@@ -51,3 +64,116 @@ class Proxy:
             url=url,
             port=port,
         )
+
+
+class ProxyStats:
+
+    def __init__(
+            self,
+            latency: float,
+    ):
+        self.latency = latency
+        self.error_rate = 0.0
+        self.consecutive_failures_amount = 0
+        self.quarantined_until = 0.0
+
+
+class ProxyPool:
+    INITIAL_LATENCY = 1.0
+    MINIMUM_LATENCY = 0.01
+    SMOOTHING_FACTOR = 0.2
+
+    def __init__(
+            self,
+            proxies: List[Proxy],
+            quarantine_failures_amount: int = PROXY_QUARANTINE_FAILURES_AMOUNT,
+            quarantine_time: float = PROXY_QUARANTINE_TIME,
+    ):
+        self.proxies = proxies
+        self.quarantine_failures_amount = quarantine_failures_amount
+        self.quarantine_time = quarantine_time
+        self._stats = {
+            proxy.format(): ProxyStats(
+                latency=self.INITIAL_LATENCY,
+            )
+            for proxy in proxies
+        }
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.proxies)
+
+    @classmethod
+    def from_strings(
+            cls,
+            proxy_strings: Optional[str],
+    ) -> 'ProxyPool':
+        return cls(
+            proxies=[
+                Proxy.from_string(proxy_str.strip())
+                for proxy_str in (proxy_strings or '').split(',')
+                if proxy_str.strip()
+            ],
+        )
+
+    def acquire(self) -> Optional[Proxy]:
+        if not self.proxies:
+            return None
+
+        now = time.monotonic()
+
+        with self._lock:
+            available_proxies = [
+                proxy for proxy in self.proxies
+                if self._stats[proxy.format()].quarantined_until <= now
+            ]
+
+            if not available_proxies:
+                return min(
+                    self.proxies,
+                    key=lambda proxy: self._stats[proxy.format()].quarantined_until,
+                )
+
+            weights = [
+                self.__get_weight(
+                    stats=self._stats[proxy.format()],
+                )
+                for proxy in available_proxies
+            ]
+            return random.choices(available_proxies, weights=weights)[0]
+
+    def report_success(
+            self,
+            proxy: Optional[Proxy],
+            latency: float,
+    ) -> None:
+        if not proxy:
+            return
+
+        with self._lock:
+            stats = self._stats[proxy.format()]
+            stats.latency += self.SMOOTHING_FACTOR * (latency - stats.latency)
+            stats.error_rate -= self.SMOOTHING_FACTOR * stats.error_rate
+            stats.consecutive_failures_amount = 0
+
+    def report_failure(
+            self,
+            proxy: Optional[Proxy],
+    ) -> None:
+        if not proxy:
+            return
+
+        with self._lock:
+            stats = self._stats[proxy.format()]
+            stats.error_rate += self.SMOOTHING_FACTOR * (1 - stats.error_rate)
+            stats.consecutive_failures_amount += 1
+
+            if stats.consecutive_failures_amount >= self.quarantine_failures_amount:
+                stats.quarantined_until = time.monotonic() + self.quarantine_time
+                stats.consecutive_failures_amount = 0
+
+    def __get_weight(
+            self,
+            stats: ProxyStats,
+    ) -> float:
+        return (1 - stats.error_rate) / max(stats.latency, self.MINIMUM_LATENCY) + self.MINIMUM_LATENCY
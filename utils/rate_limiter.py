@@ -0,0 +1,91 @@
+import asyncio
+import time
+from typing import Union
+
+from utils.redis_client import (
+    AsyncRedisClient,
+    RedisClient,
+)
+
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate) - requested
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 60)
+if tokens >= 0 then
+    return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+
+class RateLimiter:
+
+    def __init__(
+            self,
+            redis_client: Union[RedisClient, AsyncRedisClient],
+            host: str,
+            rate: float,
+            capacity: float,
+    ):
+        self.key = f'rate_limiter_{host}'
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._script = redis_client.register_script(
+            script=TOKEN_BUCKET_SCRIPT,
+        )
+
+    def reserve(
+            self,
+            tokens: int = 1,
+    ) -> float:
+        if self.rate <= 0:
+            return 0
+
+        return float(
+            self._script(
+                keys=[self.key],
+                args=[self.rate, self.capacity, tokens],
+            )
+        )
+
+    async def reserve_async(
+            self,
+            tokens: int = 1,
+    ) -> float:
+        if self.rate <= 0:
+            return 0
+
+        return float(
+            await self._script(
+                keys=[self.key],
+                args=[self.rate, self.capacity, tokens],
+            )
+        )
+
+    def acquire(
+            self,
+            tokens: int = 1,
+    ) -> None:
+        time.sleep(
+            self.reserve(
+                tokens=tokens,
+            )
+        )
+
+    async def acquire_async(
+            self,
+            tokens: int = 1,
+    ) -> None:
+        await asyncio.sleep(
+            await self.reserve_async(
+                tokens=tokens,
+            )
+        )
@@ -1,7 +1,21 @@
 import json
-from typing import Any
+from collections import defaultdict
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import redis
+import redis.asyncio
+from redis.client import PubSub
+from redis.commands.core import (
+    AsyncScript,
+    Script,
+)
 
 from config import (
     REDIS_HOST,
@@ -56,9 +70,9 @@ class RedisClient:
             main_key: str,
             inner_key: str,
             value: int,
-    ):
+    ) -> Optional[int]:
         if isinstance(value, int):
-            self._controller.hincrby(
+            return self._controller.hincrby(
                 main_key,
                 inner_key,
                 value,
@@ -77,6 +91,78 @@ class RedisClient:
             bytes_value,
         )
 
+    def set_add(
+            self,
+            key: str,
+            value: Any,
+    ) -> None:
+        bytes_value = self.__value_to_bytes(
+            value=value,
+        )
+        self._controller.sadd(
+            key,
+            bytes_value,
+        )
+
+    def set_members(
+            self,
+            key: str,
+    ) -> List[Any]:
+        return [
+            json.loads(bytes_value)
+            for bytes_value in self._controller.smembers(key)
+        ]
+
+    def set_size(
+            self,
+            key: str,
+    ) -> int:
+        return self._controller.scard(key)
+
+    def hash_set_if_missing_many(
+            self,
+            items: List[Tuple[str, Any, Any]],
+    ) -> List[Any]:
+        if not items:
+            return list()
+
+        pipeline = self._controller.pipeline()
+
+        for main_key, inner_key, value in items:
+            pipeline.hsetnx(
+                main_key,
+                inner_key,
+                self.__value_to_bytes(
+                    value=value,
+                ),
+            )
+            pipeline.hget(
+                main_key,
+                inner_key,
+            )
+
+        return [
+            json.loads(bytes_value)
+            for bytes_value in pipeline.execute()[1::2]
+        ]
+
+    def set_add_and_count(
+            self,
+            key: str,
+            value: Any,
+    ) -> int:
+        bytes_value = self.__value_to_bytes(
+            value=value,
+        )
+        pipeline = self._controller.pipeline()
+        pipeline.sadd(
+            key,
+            bytes_value,
+        )
+        pipeline.scard(key)
+        _, members_amount = pipeline.execute()
+        return members_amount
+
     def hash_get(
             self,
             main_key: str,
@@ -90,6 +176,30 @@ class RedisClient:
         if bytes_value:
             return json.loads(bytes_value)
 
+    def hash_get_all(
+            self,
+            main_key: str,
+    ) -> Dict[str, Any]:
+        return {
+            inner_key.decode(): json.loads(bytes_value)
+            for inner_key, bytes_value in self._controller.hgetall(main_key).items()
+        }
+
+    def hash_exists_many(
+            self,
+            main_key: str,
+            inner_keys: List[Any],
+    ) -> List[bool]:
+        pipeline = self._controller.pipeline()
+
+        for inner_key in inner_keys:
+            pipeline.hexists(
+                main_key,
+                inner_key,
+            )
+
+        return pipeline.execute()
+
     def left_pop(
             self,
             key: str,
@@ -107,6 +217,39 @@ class RedisClient:
 
             return json.loads(bytes_value)
 
+    def register_script(
+            self,
+            script: str,
+    ) -> Script:
+        return self._controller.register_script(script)
+
+    def publish(
+            self,
+            channel: str,
+            message: Any,
+    ) -> None:
+        self._controller.publish(
+            channel,
+            self.__value_to_bytes(
+                value=message,
+            ),
+        )
+
+    def subscribe(
+            self,
+            channel: str,
+    ) -> PubSub:
+        subscription = self._controller.pubsub(
+            ignore_subscribe_messages=True,
+        )
+        subscription.subscribe(channel)
+        return subscription
+
+    def batch(self) -> 'RedisBatch':
+        return RedisBatch(
+            controller=self._controller,
+        )
+
     def check_if_task_exists(
             self,
             key: str,
@@ -123,6 +266,285 @@ class RedisClient:
     def __value_to_bytes(
             value: Any,
     ) -> bytes:
-        return bytes(
-            json.dumps(value).encode()
+        return value_to_bytes(
+            value=value,
+        )
+
+
+class BaseRedisBatch:
+
+    def __init__(
+            self,
+            controller: Union[redis.Redis, redis.asyncio.Redis],
+    ):
+        self._controller = controller
+        self._pushed_values = defaultdict(list)
+        self._hash_increments = defaultdict(int)
+        self._hash_values = dict()
+        self._added_members = defaultdict(list)
+        self._published_messages = list()
+
+    def left_push(
+            self,
+            key: str,
+            value: Any,
+    ) -> None:
+        self._pushed_values[key].append(
+            value_to_bytes(
+                value=value,
+            )
         )
+
+    def hash_increase(
+            self,
+            main_key: str,
+            inner_key: str,
+            value: int,
+    ) -> None:
+        if isinstance(value, int):
+            self._hash_increments[(main_key, inner_key)] += value
+
+    def set_add(
+            self,
+            key: str,
+            value: Any,
+    ) -> None:
+        self._added_members[key].append(
+            value_to_bytes(
+                value=value,
+            )
+        )
+
+    def hash_set(
+            self,
+            main_key: str,
+            inner_key: str,
+            value: Any,
+    ) -> None:
+        self._hash_values[(main_key, inner_key)] = value_to_bytes(
+            value=value,
+        )
+
+    def publish(
+            self,
+            channel: str,
+            message: Any,
+    ) -> None:
+        self._published_messages.append(
+            (
+                channel,
+                value_to_bytes(
+                    value=message,
+                ),
+            )
+        )
+
+    def is_empty(self) -> bool:
+        return not (
+            self._pushed_values
+            or self._hash_increments
+            or self._hash_values
+            or self._added_members
+            or self._published_messages
+        )
+
+    def _fill_pipeline(
+            self,
+            pipeline: Union[redis.client.Pipeline, redis.asyncio.client.Pipeline],
+    ) -> None:
+        for key, bytes_values in self._pushed_values.items():
+            pipeline.lpush(
+                key,
+                *bytes_values,
+            )
+
+        for (main_key, inner_key), value in self._hash_increments.items():
+            if value:
+                pipeline.hincrby(
+                    main_key,
+                    inner_key,
+                    value,
+                )
+
+        for (main_key, inner_key), bytes_value in self._hash_values.items():
+            pipeline.hset(
+                main_key,
+                inner_key,
+                bytes_value,
+            )
+
+        for key, bytes_values in self._added_members.items():
+            pipeline.sadd(
+                key,
+                *bytes_values,
+            )
+
+        for channel, bytes_message in self._published_messages:
+            pipeline.publish(
+                channel,
+                bytes_message,
+            )
+
+    def _clear(self) -> None:
+        self._pushed_values.clear()
+        self._hash_increments.clear()
+        self._hash_values.clear()
+        self._added_members.clear()
+        self._published_messages.clear()
+
+
+class RedisBatch(BaseRedisBatch):
+
+    def __enter__(self) -> 'RedisBatch':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.is_empty():
+            return
+
+        pipeline = self._controller.pipeline()
+        self._fill_pipeline(
+            pipeline=pipeline,
+        )
+        pipeline.execute()
+        self._clear()
+
+
+class AsyncRedisClient:
+
+    def __init__(self):
+        self._controller = redis.asyncio.Redis(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_WORK_DB,
+            password=REDIS_PASSWORD,
+        )
+
+    async def hash_set(
+            self,
+            main_key: str,
+            inner_key: str,
+            value: Any,
+    ) -> None:
+        await self._controller.hset(
+            main_key,
+            inner_key,
+            value_to_bytes(
+                value=value,
+            ),
+        )
+
+    async def hash_increase(
+            self,
+            main_key: str,
+            inner_key: str,
+            value: int,
+    ) -> None:
+        if isinstance(value, int):
+            await self._controller.hincrby(
+                main_key,
+                inner_key,
+                value,
+            )
+
+    async def hash_get(
+            self,
+            main_key: str,
+            inner_key: str,
+    ) -> Any:
+        bytes_value = await self._controller.hget(
+            name=main_key,
+            key=inner_key,
+        )
+
+        if bytes_value:
+            return json.loads(bytes_value)
+
+    async def set_members(
+            self,
+            key: str,
+    ) -> List[Any]:
+        return [
+            json.loads(bytes_value)
+            for bytes_value in await self._controller.smembers(key)
+        ]
+
+    async def left_pop_many(
+            self,
+            key: str,
+            count: int,
+    ) -> List[Any]:
+        bytes_values = await self._controller.lpop(
+            name=key,
+            count=count,
+        )
+        return [json.loads(bytes_value) for bytes_value in bytes_values or list()]
+
+    async def publish(
+            self,
+            channel: str,
+            message: Any,
+    ) -> None:
+        await self._controller.publish(
+            channel,
+            value_to_bytes(
+                value=message,
+            ),
+        )
+
+    async def subscribe(
+            self,
+            channel: str,
+    ) -> redis.asyncio.client.PubSub:
+        subscription = self._controller.pubsub(
+            ignore_subscribe_messages=True,
+        )
+        await subscription.subscribe(channel)
+        return subscription
+
+    def register_script(
+            self,
+            script: str,
+    ) -> AsyncScript:
+        return self._controller.register_script(script)
+
+    def batch(self) -> 'AsyncRedisBatch':
+        return AsyncRedisBatch(
+            controller=self._controller,
+        )
+
+    async def close(self) -> None:
+        await self._controller.close()
+
+
+class AsyncRedisBatch(BaseRedisBatch):
+
+    async def __aenter__(self) -> 'AsyncRedisBatch':
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if self.is_empty():
+            return
+
+        pipeline = self._controller.pipeline()
+        self._fill_pipeline(
+            pipeline=pipeline,
+        )
+        await pipeline.execute()
+        self._clear()
+
+
+def value_to_bytes(
+        value: Any,
+) -> bytes:
+    return bytes(
+        json.dumps(value).encode()
+    )
@@ -0,0 +1,210 @@
+import asyncio
+import random
+import threading
+import time
+from typing import (
+    Dict,
+    Optional,
+)
+
+from config import (
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    CIRCUIT_BREAKER_RESET_TIMEOUT,
+)
+from utils.proxy import Proxy
+
+RETRYABLE_STATUS_CODES = frozenset({
+    408,
+    425,
+    429,
+})
+
+PROXY_REJECTED_STATUS_CODES = frozenset({
+    403,
+    407,
+})
+
+
+class RetryableStatusError(Exception):
+
+    def __init__(
+            self,
+            status_code: int,
+            retry_after: Optional[str] = None,
+    ):
+        super().__init__(f'Retryable response status: {status_code}')
+        self.status_code = status_code
+        self.retry_after = self.__parse_retry_after(
+            retry_after=retry_after,
+        )
+
+    @staticmethod
+    def __parse_retry_after(
+            retry_after: Optional[str],
+    ) -> Optional[float]:
+        try:
+            return float(retry_after)
+        except (
+                ValueError,
+                TypeError,
+        ):
+            return None
+
+
+class NonRetryableStatusError(Exception):
+
+    def __init__(
+            self,
+            status_code: int,
+    ):
+        super().__init__(f'Non-retryable response status: {status_code}')
+        self.status_code = status_code
+
+
+class ProxyRejectedError(Exception):
+
+    def __init__(
+            self,
+            status_code: int,
+    ):
+        super().__init__(f'Proxy rejected response status: {status_code}')
+        self.status_code = status_code
+
+
+class RetryPolicy:
+
+    def __init__(
+            self,
+            max_retries: int,
+            base_delay: float = RETRY_BASE_DELAY,
+            max_delay: float = RETRY_MAX_DELAY,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def get_delay(
+            self,
+            retry_number: int,
+            retry_after: Optional[float] = None,
+    ) -> float:
+        backoff_delay = min(self.max_delay, self.base_delay * 2 ** retry_number)
+        delay = random.uniform(0, backoff_delay)
+
+        if retry_after:
+            delay = max(delay, min(retry_after, self.max_delay))
+
+        return delay
+
+    def is_last_retry(
+            self,
+            retry_number: int,
+    ) -> bool:
+        return retry_number + 1 >= self.max_retries
+
+    @staticmethod
+    def is_retryable_status(
+            status_code: int,
+    ) -> bool:
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+
+    @staticmethod
+    def is_proxy_rejected_status(
+            status_code: int,
+            proxy: Optional[Proxy],
+    ) -> bool:
+        return proxy is not None and status_code in PROXY_REJECTED_STATUS_CODES
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    HALF_OPEN_POLL_INTERVAL = 0.5
+
+    _BREAKERS: Dict[str, 'CircuitBreaker'] = dict()
+    _BREAKERS_LOCK = threading.Lock()
+
+    def __init__(
+            self,
+            host: str,
+            failure_threshold: int = CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout: float = CIRCUIT_BREAKER_RESET_TIMEOUT,
+    ):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures_amount = 0
+        self.opened_at = None
+        self.probe_started_at = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_host(
+            cls,
+            host: str,
+    ) -> 'CircuitBreaker':
+        with cls._BREAKERS_LOCK:
+            if host not in cls._BREAKERS:
+                cls._BREAKERS[host] = cls(
+                    host=host,
+                )
+
+            return cls._BREAKERS[host]
+
+    def get_wait_time(self) -> float:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0
+
+            now = time.monotonic()
+
+            if self.state == self.OPEN:
+                remaining_time = self.opened_at + self.reset_timeout - now
+
+                if remaining_time > 0:
+                    return remaining_time
+
+                self.state = self.HALF_OPEN
+                self.probe_started_at = now
+                return 0
+
+            remaining_probe_time = self.probe_started_at + self.reset_timeout - now
+
+            if remaining_probe_time > 0:
+                return min(remaining_probe_time, self.HALF_OPEN_POLL_INTERVAL)
+
+            self.probe_started_at = now
+            return 0
+
+    def acquire(self) -> None:
+        wait_time = self.get_wait_time()
+
+        while wait_time > 0:
+            time.sleep(wait_time)
+            wait_time = self.get_wait_time()
+
+    async def acquire_async(self) -> None:
+        wait_time = self.get_wait_time()
+
+        while wait_time > 0:
+            await asyncio.sleep(wait_time)
+            wait_time = self.get_wait_time()
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures_amount = 0
+            self.opened_at = None
+            self.probe_started_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures_amount += 1
+
+            if self.state == self.HALF_OPEN or self.failures_amount >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
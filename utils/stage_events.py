@@ -0,0 +1,104 @@
+import json
+import time
+from typing import (
+    List,
+    Optional,
+    Union,
+)
+
+import redis.asyncio
+from redis.client import PubSub
+
+from constants import STAGE_EVENTS_CHANNEL
+from utils.redis_client import (
+    AsyncRedisClient,
+    RedisBatch,
+    RedisClient,
+)
+
+
+class StageEvents:
+
+    def __init__(
+            self,
+            redis_client: Union[RedisClient, AsyncRedisClient],
+            channel: str = STAGE_EVENTS_CHANNEL,
+    ):
+        self.redis_client = redis_client
+        self.channel = channel
+        self.subscription: Optional[Union[PubSub, redis.asyncio.client.PubSub]] = None
+
+    def publish(
+            self,
+            filter_name: str,
+            stage: str,
+            redis_writer: Optional[RedisBatch] = None,
+    ) -> None:
+        (redis_writer or self.redis_client).publish(
+            channel=self.channel,
+            message={
+                'filter_name': filter_name,
+                'stage': stage,
+            },
+        )
+
+    async def publish_async(
+            self,
+            filter_name: str,
+            stage: str,
+    ) -> None:
+        await self.redis_client.publish(
+            channel=self.channel,
+            message={
+                'filter_name': filter_name,
+                'stage': stage,
+            },
+        )
+
+    def subscribe(self) -> None:
+        self.subscription = self.redis_client.subscribe(
+            channel=self.channel,
+        )
+
+    def wait(
+            self,
+            timeout: float,
+    ) -> List[dict]:
+        events = list()
+        deadline = time.monotonic() + timeout
+
+        while True:
+            message = self.subscription.get_message(
+                timeout=0 if events else max(0.0, deadline - time.monotonic()),
+            )
+
+            if message:
+                events.append(
+                    json.loads(message['data'])
+                )
+            elif events or time.monotonic() >= deadline:
+                return events
+
+    async def subscribe_async(self) -> None:
+        self.subscription = await self.redis_client.subscribe(
+            channel=self.channel,
+        )
+
+    async def wait_async(
+            self,
+            timeout: float,
+    ) -> List[dict]:
+        events = list()
+        deadline = time.monotonic() + timeout
+
+        while True:
+            message = await self.subscription.get_message(
+                timeout=0 if events else max(0.0, deadline - time.monotonic()),
+            )
+
+            if message:
+                events.append(
+                    json.loads(message['data'])
+                )
+            elif events or time.monotonic() >= deadline:
+                return events